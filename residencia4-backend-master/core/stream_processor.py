@@ -28,7 +28,7 @@ clip_queue = Queue(maxsize=10)
 def capture_thread(video_source_info, duration, current_mode):
     print(f"[Capture Thread] Iniciando captura contínua. Modo: {current_mode}")
     while not stop_event.is_set(): 
-        temp_dir = config.BASE_DIR / "temp_clips"
+        temp_dir = config.TEMP_CLIPS_DIR
         os.makedirs(temp_dir, exist_ok=True)
         temp_clip_path = os.path.join(temp_dir, f"clip_{int(time.time())}.mp4")
         
@@ -175,19 +175,22 @@ def capture_clip(default_source, duration, output_path):
     command = []
     is_device_source = isinstance(current_source, (tuple, list))
 
+    # faststart: moov no início do MP4, para a IA decodificar enquanto o clipe ainda
+    # está sendo enviado (com o moov no fim, ela precisa esperar o upload inteiro).
     if using_bridge:
-        command = [ffmpeg_exe, "-i", current_source, "-t", str(duration), "-c", "copy", "-y", output_path]
+        command = [ffmpeg_exe, "-i", current_source, "-t", str(duration), "-c", "copy",
+                   "-movflags", "+faststart", "-y", output_path]
     elif is_device_source:
         video_device, audio_device = current_source
         command = [
             ffmpeg_exe, "-f", "dshow", "-rtbufsize", "100M",
             "-i", f"video={video_device}:audio={audio_device}", 
-            "-t", str(duration), "-y", output_path
+            "-t", str(duration), "-movflags", "+faststart", "-y", output_path
         ]
     else: 
         command = [
             ffmpeg_exe, "-i", current_source, "-t", str(duration), 
-            "-c:v", "copy", "-c:a", "copy", "-y", output_path
+            "-c:v", "copy", "-c:a", "copy", "-movflags", "+faststart", "-y", output_path
         ]
     
     timeout = duration + 20
@@ -219,14 +222,46 @@ def trim_video_clip(input_path, output_path, start_time, duration):
         print(f"[Processor] ERRO ao cortar: {e}")
         return False
 
+def shared_clip_path(video_path: str):
+    """Caminho do clipe visto pela IA, ou None se ele não estiver no volume compartilhado."""
+    clips_dir = os.path.realpath(config.TEMP_CLIPS_DIR)
+    real_path = os.path.realpath(video_path)
+    if os.path.commonpath([real_path, clips_dir]) != clips_dir:
+        return None
+    return os.path.join(config.IA_SHARED_CLIPS_DIR, os.path.relpath(real_path, clips_dir))
+
+def send_clip_to_ia(video_path: str, priority: str = "live"):
+    ia_path = shared_clip_path(video_path) if config.IA_UPLOAD_MODE == "path" else None
+    if ia_path:
+        return requests.post(config.IA_PATH_URL, json={'path': ia_path, 'priority': priority}, timeout=600)
+    with open(video_path, "rb") as video_file:
+        # Arquivos do modo FILE (fora do volume compartilhado) vão por multipart: a IA
+        # grava em disco e lê de lá. O stream fica para os clipes curtos do ao vivo.
+        if config.IA_UPLOAD_MODE in ("stream", "path") and priority == "live":
+            return requests.post(
+                config.IA_STREAM_URL, data=video_file, timeout=600,
+                params={'filename': os.path.basename(video_path), 'priority': priority},
+                headers={'Content-Type': 'video/mp4'}
+            )
+        files = {'video_file': (os.path.basename(video_path), video_file, 'video/mp4')}
+        return requests.post(IA_SERVICE_URL, files=files, params={'priority': priority}, timeout=600)
+
 def analyze_clip_from_path(video_path: str, is_temp_file: bool = True):
     if not os.path.exists(video_path): return
     
     errors = []
+    # Clipes do monitoramento ao vivo passam na frente das análises do modo FILE.
+    priority = "live" if is_temp_file else "archive"
     try:
-        with open(video_path, "rb") as video_file:
-            files = {'video_file': (os.path.basename(video_path), video_file, 'video/mp4')}
-            response = requests.post(IA_SERVICE_URL, files=files, timeout=600)
+        response = send_clip_to_ia(video_path, priority)
+        # Fila da IA cheia: espera o Retry-After indicado antes de reenviar.
+        for _ in range(config.IA_BUSY_RETRIES):
+            if response.status_code != 429 or stop_event.is_set():
+                break
+            retry_after = int(response.headers.get("Retry-After", 5))
+            print(f"[Processor] IA ocupada; reenviando em {retry_after}s.")
+            time.sleep(retry_after)
+            response = send_clip_to_ia(video_path, priority)
         response.raise_for_status()
         result = response.json()
         errors = result.get("errors", [])
@@ -8,6 +8,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 VIDEO_BASE_DIR = os.getenv("VIDEO_BASE_DIR", BASE_DIR / "video_ocorrencias")
 THUMBNAIL_BASE_DIR = os.getenv("THUMBNAIL_BASE_DIR", BASE_DIR / "video_thumbnails")
+# Clipes capturados para análise; no modo "path" deve ser um volume montado também na IA.
+TEMP_CLIPS_DIR = os.getenv("TEMP_CLIPS_DIR", str(BASE_DIR / "temp_clips"))
 
 DEFAULT_TEST_VIDEO = BASE_DIR / "teste21.mp4"
 TEST_VIDEO_PATH = os.getenv("TEST_VIDEO_PATH", str(DEFAULT_TEST_VIDEO))
@@ -23,6 +25,18 @@ if not DATABASE_URL:
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 
 IA_SERVICE_URL = os.getenv("IA_SERVICE_URL", "http://ia-service:8001/analyze_video")
+IA_BASE_URL = IA_SERVICE_URL.rsplit("/", 1)[0]
+# "stream": envia o clipe ao vivo como corpo bruto para /analyze_stream (a IA decodifica
+# durante o upload); arquivos do modo FILE continuam indo por multipart.
+# "path": envia só o caminho do clipe no volume compartilhado para /analyze_path.
+# "multipart": envio legado para IA_SERVICE_URL.
+IA_UPLOAD_MODE = os.getenv("IA_UPLOAD_MODE", "stream")
+IA_STREAM_URL = os.getenv("IA_STREAM_URL", f"{IA_BASE_URL}/analyze_stream")
+IA_PATH_URL = os.getenv("IA_PATH_URL", f"{IA_BASE_URL}/analyze_path")
+# Ponto de montagem de TEMP_CLIPS_DIR dentro do container da IA.
+IA_SHARED_CLIPS_DIR = os.getenv("IA_SHARED_CLIPS_DIR", "/shared/clips")
+# Tentativas quando a fila da IA está cheia (HTTP 429).
+IA_BUSY_RETRIES = int(os.getenv("IA_BUSY_RETRIES", 3))
 
 LIMIT_C = int(os.getenv("LIMIT_C", 4))
 LIMIT_B = int(os.getenv("LIMIT_B", 9))
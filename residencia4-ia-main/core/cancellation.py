@@ -0,0 +1,29 @@
+import threading
+
+class AnalysisCancelled(Exception):
+    """Análise interrompida porque ninguém mais espera o resultado."""
+
+class CancellationToken:
+    """
+    Cancelamento cooperativo de uma análise. Quem dispara (desconexão do cliente,
+    DELETE /jobs/{id}) chama cancel(); o frame loop do Engine e as tarefas de
+    Lipsync/Inteligibilidade consultam o token entre etapas e abandonam o trabalho.
+    Thread-safe: é disparado no event loop e lido nas threads do executor.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason: str = "cancelado"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """Levanta AnalysisCancelled se o cancelamento foi pedido."""
+        if self._event.is_set():
+            raise AnalysisCancelled(self.reason)
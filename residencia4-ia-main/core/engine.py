@@ -1,23 +1,60 @@
-import cv2
-import time
+import os
 import threading
-import queue
-import numpy as np
 import logging
-from typing import List
+from typing import List, Optional
 from core.interfaces import VideoDetector, AudioDetector
-from core.media_loader import MediaLoader
+from core.media_loader import MediaLoader, SYNC_FRAME_RATE_HZ
+from core.frame_bundle import FrameBundle
+from core.frame_features import FRAME_FEATURES, compute_features
+from core.ocr_service import OcrService
+from core.ingest import open_container
+from core.cancellation import CancellationToken
 
 logger = logging.getLogger(__name__)
 
+# Teto de memória do anel de frames decodificados (por requisição).
+FRAME_BUFFER_MB = int(os.getenv("FRAME_BUFFER_MB", 128))
+
 class FrameProvider:
-    """Lê frames em uma thread separada."""
-    def __init__(self, video_path, queue_size=64):
-        self.cap = cv2.VideoCapture(video_path)
-        self.queue = queue.Queue(maxsize=queue_size)
+    """
+    Decodifica frames com PyAV (frame-threading do codec) em uma thread separada
+    para um anel fixo de slots. O produtor bloqueia em uma Condition quando o anel
+    está cheio e é acordado assim que o consumidor libera um slot (sem polling).
+
+    Os slots guardam referências aos frames nativos do decoder (sem conversão
+    para BGR), no lugar do anel de buffers numpy pré-alocados preenchidos por
+    cap.read(slot): o PyAV aloca cada frame, e o slot só o mantém vivo até o
+    consumidor liberá-lo. O redimensionamento para a resolução de análise é feito
+    no libswscale pelo FrameBundle, só quando algum detector pede. O frame
+    retornado por read() só é garantido até a próxima chamada de read()/release().
+
+    O teto FRAME_BUFFER_MB cobre o anel e o FrameBundle em processamento, cujas
+    conversões em cache (BGR e cinza em resolução original, no pior caso) são
+    descontadas antes de dividir o restante em slots.
+    """
+    def __init__(self, video_path, max_buffer_mb=FRAME_BUFFER_MB, max_slots=64):
+        self.container = open_container(video_path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        self.fps = float(self.stream.average_rate or 25)
+        self.total_frames = self.stream.frames
+
+        # Frame nativo em yuv420p: 1.5 byte por pixel. O bundle em processamento
+        # pode guardar BGR (3) + cinza (1) em resolução original: 4 bytes por pixel.
+        width = self.stream.codec_context.width or 1920
+        height = self.stream.codec_context.height or 1080
+        bundle_bytes = width * height * 4
+        ring_bytes = max(0, max_buffer_mb * 1024 * 1024 - bundle_bytes)
+        slots = int(ring_bytes // max(width * height * 3 // 2, 1))
+        self.ring = [None] * max(2, min(max_slots, slots))
+
+        self.head = 0
+        self.tail = 0
+        self.count = 0
+        self.holding = False
+        self.eof = False
         self.stopped = False
-        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25
-        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.cond = threading.Condition()
         
         self.thread = threading.Thread(target=self.update, args=())
         self.thread.daemon = True
@@ -27,85 +64,192 @@ class FrameProvider:
         return self
 
     def update(self):
-        while not self.stopped:
-            if not self.queue.full():
-                ret, frame = self.cap.read()
-                if not ret:
-                    self.stopped = True
-                    return
-                self.queue.put(frame)
-            else:
-                time.sleep(0.01)
-        self.cap.release()
+        try:
+            for frame in self.container.decode(self.stream):
+                with self.cond:
+                    while self.count == len(self.ring) and not self.stopped:
+                        self.cond.wait()
+                    if self.stopped:
+                        return
+                    self.ring[self.head] = frame
+                    self.head = (self.head + 1) % len(self.ring)
+                    self.count += 1
+                    self.cond.notify_all()
+        except Exception as e:
+            logger.error(f"Erro na decodificação de vídeo: {e}")
+        finally:
+            with self.cond:
+                self.eof = True
+                self.cond.notify_all()
+            self.container.close()
+
+    def _release_locked(self):
+        if self.holding:
+            self.holding = False
+            self.ring[self.tail] = None
+            self.tail = (self.tail + 1) % len(self.ring)
+            self.count -= 1
+            self.cond.notify_all()
+
+    def release(self):
+        """Devolve ao produtor o slot entregue pelo último read()."""
+        with self.cond:
+            self._release_locked()
 
     def read(self):
-        if self.stopped and self.queue.empty():
-            return None
-        try:
-            return self.queue.get(timeout=1)
-        except queue.Empty:
-            return None
+        with self.cond:
+            self._release_locked()
+            while self.count == 0 and not self.eof:
+                self.cond.wait()
+            if self.count == 0:
+                return None
+            self.holding = True
+            return self.ring[self.tail]
             
     def more(self):
-        return not (self.stopped and self.queue.empty())
+        with self.cond:
+            return not (self.eof and self.count == 0)
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        self.thread.join(timeout=5)
+
+class RateClock:
+    """Amostrador por tempo (PTS): marca como devido um frame a cada 1/rate_hz segundos."""
+    def __init__(self, rate_hz: Optional[float], fps: float):
+        self.period = 1.0 / rate_hz if rate_hz else 0.0
+        # Tolerância de meio frame para não perder a amostra por jitter de PTS.
+        self.tolerance = 0.5 / fps
+        self.next_due = None
+
+    def due(self, timestamp: float) -> bool:
+        if self.next_due is not None and timestamp < self.next_due - self.tolerance:
+            return False
+        if self.next_due is None or self.next_due + self.period <= timestamp:
+            self.next_due = timestamp + self.period
+        else:
+            self.next_due += self.period
+        return True
 
 class AnalysisEngine:
-    def __init__(self, video_path):
+    def __init__(self, video_path, media_loader: Optional[MediaLoader] = None,
+                 ocr_service: Optional[OcrService] = None,
+                 cancel_token: Optional[CancellationToken] = None):
         self.video_path = video_path
         self.video_detectors: List[VideoDetector] = []
         self.audio_detectors: List[AudioDetector] = []
         self.resize_width = 640  
-        logger.info("Carregando Media Context (PyAV)...")
-        self.media_loader = MediaLoader(video_path)
+        self.frame_buffer_mb = FRAME_BUFFER_MB
+        # Quando o contexto é compartilhado (main.py), quem o criou é responsável por fechá-lo.
+        self.owns_media_loader = media_loader is None
+        if media_loader is None:
+            logger.info("Carregando Media Context (PyAV)...")
+            media_loader = MediaLoader(video_path)
+        self.media_loader = media_loader
+        self.ocr_service = ocr_service
+        self.cancel_token = cancel_token
 
     def add_video_detector(self, detector: VideoDetector):
+        unknown = [f for f in detector.required_features if f not in FRAME_FEATURES]
+        if unknown:
+            raise ValueError(f"Detector {detector.name} depende de features inexistentes: {unknown}")
+        if detector.uses_ocr:
+            detector.ocr = self.ocr_service
         self.video_detectors.append(detector)
 
     def add_audio_detector(self, detector: AudioDetector):
         self.audio_detectors.append(detector)
 
+    def _check_cancelled(self):
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+
     def run(self):
         logger.info(f"Iniciando Engine Single-Pass para: {self.video_path}")
 
+        # Vídeo primeiro: o áudio é decodificado em paralelo pelo MediaLoader.
+        try:
+            self._run_video()
+        finally:
+            self.media_loader.finish_video()
+
         for det in self.audio_detectors:
+            self._check_cancelled()
             try:
                 det.process_audio(self.media_loader)
             except Exception as e:
                 logger.error(f"Erro no detector de áudio {det.name}: {e}")
 
-        provider = FrameProvider(self.video_path).start()
-        frame_idx = 0
-        
-        while provider.more():
-            frame = provider.read()
-            if frame is None: break
-
-            frame_idx += 1
-            timestamp = frame_idx / provider.fps
-
-            h, w = frame.shape[:2]
-            scale = self.resize_width / float(w)
-            small_frame = cv2.resize(frame, None, fx=scale, fy=scale)
-            gray_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
-
-            for det in self.video_detectors:
-                try:
-                    det.process_frame(
-                        full_frame=frame, 
-                        small_frame=small_frame, 
-                        small_gray=gray_frame, 
-                        timestamp=timestamp, 
-                        frame_idx=frame_idx
-                    )
-                except Exception as e:
-                    logger.error(f"Erro no detector {det.name} frame {frame_idx}: {e}")
-
         # Limpeza
-        self.media_loader.close()
+        if self.owns_media_loader:
+            self.media_loader.close()
         
         all_errors = []
         for det in self.video_detectors + self.audio_detectors:
             all_errors.extend(det.get_errors())
             
         logger.info(f"Análise finalizada. Total erros: {len(all_errors)}")
-        return all_errors
\ No newline at end of file
+        return all_errors
+
+    def _run_video(self):
+        provider = FrameProvider(self.video_path, max_buffer_mb=self.frame_buffer_mb).start()
+        fps = provider.fps
+
+        clocks = []
+        for det in self.video_detectors:
+            det.configure(fps)
+            clocks.append(RateClock(det.analysis_rate_hz, fps))
+        sync_clock = RateClock(SYNC_FRAME_RATE_HZ, fps) if self.media_loader.wants_sync_frames else None
+
+        frame_idx = 0
+        start_time = None
+
+        try:
+            while provider.more():
+                frame = provider.read()
+                if frame is None: break
+                self._check_cancelled()
+
+                frame_idx += 1
+                if frame.time is None:
+                    timestamp = frame_idx / fps
+                else:
+                    if start_time is None:
+                        start_time = frame.time - 1.0 / fps
+                    timestamp = frame.time - start_time
+
+                due = [det for det, clock in zip(self.video_detectors, clocks) if clock.due(timestamp)]
+                share_frame = sync_clock is not None and sync_clock.due(timestamp)
+
+                # Nenhum consumidor neste frame: não gera nenhuma representação.
+                if not due and not share_frame:
+                    continue
+
+                bundle = FrameBundle(frame, resize_width=self.resize_width)
+                compute_features(bundle, [f for det in due for f in det.required_features])
+
+                if share_frame:
+                    self.media_loader.add_sync_frame(bundle)
+
+                for det in due:
+                    try:
+                        det.process_frame(
+                            frame=bundle, 
+                            timestamp=timestamp, 
+                            frame_idx=frame_idx
+                        )
+                    except Exception as e:
+                        logger.error(f"Erro no detector {det.name} frame {frame_idx}: {e}")
+        finally:
+            provider.stop()
+
+        for det in self.video_detectors:
+            try:
+                det.finish()
+            except Exception as e:
+                logger.error(f"Erro ao finalizar detector {det.name}: {e}")
+
+        if self.ocr_service is not None:
+            self.ocr_service.log_stats()
\ No newline at end of file
@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+
+class FrameBundle:
+    """
+    Pirâmide de representações de um frame, construída sob demanda.
+    Cada representação é gerada no máximo uma vez por frame e somente se algum
+    detector pedir por ela: full -> small (largura de análise) -> resized(w, h).
+
+    Aceita um av.VideoFrame (decoder PyAV) ou um ndarray BGR. Com o frame do
+    decoder, small e small_gray são escalados direto no libswscale e o BGR em
+    resolução original só é produzido se algum detector acessar `full`.
+    """
+    def __init__(self, frame, resize_width=640):
+        self._frame = frame
+        self._is_av = not isinstance(frame, np.ndarray)
+        if self._is_av:
+            self.width, self.height = frame.width, frame.height
+        else:
+            self.height, self.width = frame.shape[:2]
+        self.small_width = resize_width
+        self.small_height = max(1, int(round(self.height * resize_width / float(self.width))))
+        self._cache = {}
+        self.features = {}
+
+    def _memo(self, key, build):
+        value = self._cache.get(key)
+        if value is None:
+            value = build()
+            self._cache[key] = value
+        return value
+
+    def _scaled(self, fmt):
+        return self._frame.reformat(width=self.small_width, height=self.small_height, format=fmt).to_ndarray()
+
+    @property
+    def full(self):
+        """Frame BGR em resolução original."""
+        if not self._is_av:
+            return self._frame
+        return self._memo("full", lambda: self._frame.to_ndarray(format='bgr24'))
+
+    @property
+    def shape(self):
+        return (self.height, self.width, 3)
+
+    @property
+    def full_gray(self):
+        def build():
+            if self._is_av:
+                return self._frame.to_ndarray(format='gray')
+            return cv2.cvtColor(self.full, cv2.COLOR_BGR2GRAY)
+        return self._memo("full_gray", build)
+
+    @property
+    def small(self):
+        """Frame BGR reduzido para a largura de análise, mantendo a proporção."""
+        def build():
+            if self._is_av:
+                return self._scaled('bgr24')
+            return cv2.resize(self.full, (self.small_width, self.small_height))
+        return self._memo("small", build)
+
+    @property
+    def small_gray(self):
+        def build():
+            if self._is_av:
+                return self._scaled('gray')
+            return cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY)
+        return self._memo("small_gray", build)
+
+    def resized(self, width, height):
+        """Frame BGR em tamanho fixo (ex.: 224x224), derivado do frame reduzido."""
+        return self._memo(("resized", width, height), lambda: cv2.resize(self.small, (width, height)))
+
+    def roi(self, y_start, y_end, x_start, x_end):
+        """Recorte do frame original por frações da altura/largura."""
+        def build():
+            h, w = self.height, self.width
+            return self.full[int(h * y_start):int(h * y_end), int(w * x_start):int(w * x_end)]
+        return self._memo(("roi", y_start, y_end, x_start, x_end), build)
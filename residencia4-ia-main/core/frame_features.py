@@ -0,0 +1,28 @@
+import cv2
+import numpy as np
+
+# Registro de features escalares por frame. Detectores declaram as que consomem em
+# `required_features`; o Engine calcula cada uma uma única vez por frame.
+FRAME_FEATURES = {}
+
+def frame_feature(name):
+    """Registra uma função `fn(frame: FrameBundle) -> float` sob o nome dado."""
+    def register(fn):
+        FRAME_FEATURES[name] = fn
+        return fn
+    return register
+
+def compute_features(frame, names):
+    """Calcula as features pedidas sobre o FrameBundle e as guarda em `frame.features`."""
+    for name in names:
+        if name not in frame.features:
+            frame.features[name] = FRAME_FEATURES[name](frame)
+    return frame.features
+
+@frame_feature("laplacian_var")
+def _laplacian_var(frame):
+    return cv2.Laplacian(frame.small_gray, cv2.CV_64F).var()
+
+@frame_feature("brightness")
+def _brightness(frame):
+    return float(np.mean(frame.small_gray))
@@ -0,0 +1,164 @@
+import io
+import os
+import uuid
+import threading
+import av
+
+# Uploads acima deste tamanho não são mantidos em memória: continuam em um arquivo
+# temporário (spill) e a análise segue lendo de lá.
+STREAM_INGEST_MAX_MB = int(os.getenv("STREAM_INGEST_MAX_MB", 512))
+STREAM_INGEST_MAX_BYTES = STREAM_INGEST_MAX_MB * 1024 * 1024
+# Uploads multipart da fila "live" até este tamanho (clipes) ficam em memória enquanto
+# aguardam na fila; o resto vai para TEMP_DIR. Com IA_MAX_QUEUED_JOBS jobs parados,
+# um limite alto prenderia gigabytes de RAM.
+MEMORY_INGEST_MAX_MB = int(os.getenv("MEMORY_INGEST_MAX_MB", 32))
+MEMORY_INGEST_MAX_BYTES = MEMORY_INGEST_MAX_MB * 1024 * 1024
+
+class StreamingUpload:
+    """
+    Buffer em memória alimentado pelo corpo da requisição enquanto a análise já
+    decodifica. Cada consumidor (MediaLoader, FrameProvider) abre o seu próprio
+    leitor com open(); as leituras bloqueiam até os bytes pedidos chegarem.
+
+    Com `spill_dir`, ao passar de `max_bytes` o conteúdo vai para um arquivo
+    temporário nesse diretório e o restante do upload é anexado a ele; close()
+    remove o arquivo.
+    """
+    def __init__(self, name: str, spill_dir: str = None, max_bytes: int = STREAM_INGEST_MAX_BYTES):
+        self.name = name
+        self.buffer = bytearray()
+        self.size = 0
+        self.spill_dir = spill_dir
+        self.max_bytes = max_bytes
+        self.spill_path = None
+        self._fd = None
+        self.closed = False
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    @classmethod
+    def from_bytes(cls, name: str, data: bytes):
+        upload = cls(name)
+        upload.feed(data)
+        upload.finish()
+        return upload
+
+    def __str__(self):
+        return self.name
+
+    def feed(self, data: bytes):
+        with self.cond:
+            if self.closed:
+                return
+            if self._fd is not None:
+                self._write(data)
+            else:
+                self.buffer.extend(data)
+                if self.spill_dir and len(self.buffer) > self.max_bytes:
+                    self._spill()
+            self.size += len(data)
+            self.cond.notify_all()
+
+    def _spill(self):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self.spill_path = os.path.join(self.spill_dir, f"{uuid.uuid4()}_{os.path.basename(self.name)}")
+        self._fd = os.open(self.spill_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        self._write(self.buffer)
+        self.buffer = None
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+    @property
+    def spilled(self) -> bool:
+        return self.spill_path is not None
+
+    def close(self):
+        """Libera o buffer ou o arquivo de spill (chamado ao fim da análise)."""
+        with self.cond:
+            self.closed = True
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if self.spill_path and os.path.exists(self.spill_path):
+                os.remove(self.spill_path)
+            self.buffer = bytearray()
+
+    def finish(self, error=None):
+        """Marca o fim do upload; com `error`, os leitores veem EOF no ponto em que pararam."""
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def wait_for(self, size: int) -> int:
+        """Bloqueia até haver `size` bytes (ou o upload terminar); retorna o total disponível."""
+        with self.cond:
+            while self.size < size and not self.done:
+                self.cond.wait()
+            return self.size
+
+    def wait_done(self) -> int:
+        with self.cond:
+            while not self.done:
+                self.cond.wait()
+            return self.size
+
+    def read_at(self, pos: int, size: int) -> bytes:
+        available = self.wait_for(pos + size)
+        end = min(pos + size, available)
+        if end <= pos:
+            return b""
+        with self.cond:
+            if self._fd is not None:
+                return os.pread(self._fd, end - pos, pos)
+            return bytes(self.buffer[pos:end])
+
+    def open(self):
+        return UploadReader(self)
+
+class UploadReader(io.RawIOBase):
+    """Leitor file-like (com seek) sobre um StreamingUpload, usado como entrada do PyAV."""
+    def __init__(self, upload: StreamingUpload):
+        self.upload = upload
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.upload.wait_done() - self.pos
+        data = self.upload.read_at(self.pos, max(size, 0))
+        self.pos += len(data)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        else:
+            # Posição relativa ao fim: só é conhecida com o upload completo (ex.: moov no fim do MP4).
+            self.pos = self.upload.wait_done() + offset
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+def open_container(source):
+    """Abre um container PyAV a partir de um caminho ou de um StreamingUpload."""
+    if isinstance(source, StreamingUpload):
+        return av.open(source.open(), mode='r')
+    return av.open(source)
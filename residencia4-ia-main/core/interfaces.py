@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Any
+from typing import List, Any, Optional, Tuple
 import numpy as np
 
 class BaseDetector(ABC):
@@ -11,9 +11,31 @@ class BaseDetector(ABC):
         return self.errors
 
 class VideoDetector(BaseDetector):
+    # Nomes das features escalares (core.frame_features) lidas em frame.features.
+    required_features: Tuple[str, ...] = ()
+    # Taxa alvo de análise em Hz. O Engine agenda os frames pelo PTS; None = todos os frames.
+    analysis_rate_hz: Optional[float] = None
+    # Intervalo real entre amostras entregues (definido pelo Engine em configure()).
+    sample_interval: float = 1.0 / 25.0
+    # Detectores de texto recebem o OcrService do Engine em `self.ocr`.
+    uses_ocr: bool = False
+    ocr = None
+
+    def configure(self, fps: float):
+        """Chamado pelo Engine antes do primeiro frame, com o fps real do vídeo."""
+        rate = fps if self.analysis_rate_hz is None else min(self.analysis_rate_hz, fps)
+        self.sample_interval = 1.0 / rate
+
     @abstractmethod
-    def process_frame(self, full_frame, small_frame, small_gray, timestamp: float, frame_idx: int):
-        """Processa um único frame."""
+    def process_frame(self, frame, timestamp: float, frame_idx: int):
+        """
+        Processa um único frame. `frame` é um FrameBundle: as representações
+        (small, small_gray, full_gray, resized...) são geradas sob demanda.
+        """
+        pass
+
+    def finish(self):
+        """Chamado pelo Engine ao fim do vídeo para processar amostras pendentes (lotes)."""
         pass
 
 class AudioDetector(BaseDetector):
@@ -0,0 +1,268 @@
+import os
+import time
+import uuid
+import math
+import asyncio
+import logging
+from collections import deque
+from core.cancellation import CancellationToken, AnalysisCancelled
+
+logger = logging.getLogger(__name__)
+
+# Análises executando ao mesmo tempo; o restante espera na fila.
+IA_MAX_CONCURRENT_JOBS = int(os.getenv("IA_MAX_CONCURRENT_JOBS", 2))
+# Jobs aguardando em cada fila (lane) antes de a IA responder 429.
+IA_MAX_QUEUED_JOBS = int(os.getenv("IA_MAX_QUEUED_JOBS", 16))
+# Vagas de execução que jobs de arquivo nunca ocupam, para um clipe ao vivo não
+# esperar uma análise longa terminar.
+IA_LIVE_RESERVED_SLOTS = int(os.getenv("IA_LIVE_RESERVED_SLOTS", 1))
+# Tempo que o resultado de um job finalizado fica disponível em GET /jobs/{id}.
+JOB_RESULT_TTL_S = int(os.getenv("JOB_RESULT_TTL_S", 3600))
+
+# Classes de prioridade, da mais para a menos urgente: "live" são os clipes de
+# 10 s do monitoramento (SRT/DEVICE), "archive" as análises do modo FILE.
+JOB_LANES = ("live", "archive")
+
+class QueueFull(Exception):
+    """Fila de jobs cheia; `retry_after` é a estimativa (s) para uma vaga."""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Fila de análise cheia; tente novamente em {retry_after}s.")
+        self.retry_after = retry_after
+
+class Job:
+    def __init__(self, source, cleanup=None, lane="live"):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.cleanup = cleanup
+        self.lane = lane
+        self.token = CancellationToken()
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = asyncio.get_running_loop().create_future()
+        # Jobs assíncronos ninguém aguarda: evita o aviso de exceção não recuperada.
+        self.done.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    async def wait(self):
+        """Aguarda o resultado; o cancelamento de quem espera não interrompe o job."""
+        return await asyncio.shield(self.done)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def wait_time(self):
+        if self.started_at is None:
+            return None
+        return self.started_at - self.created_at
+
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.lane,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wait_time": self.wait_time,
+        }
+        if self.status == "done":
+            data["errors"] = self.result
+        elif self.status in ("failed", "cancelled"):
+            data["detail"] = self.error
+        return data
+
+class LaneStats:
+    """Tempo de espera em fila (criação -> início da execução) de uma lane."""
+    def __init__(self):
+        self.started = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = None
+
+    def record(self, wait):
+        self.started += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.last_wait = wait
+
+    def to_dict(self):
+        return {
+            "started": self.started,
+            "avg_wait_s": self.total_wait / self.started if self.started else None,
+            "max_wait_s": self.max_wait,
+            "last_wait_s": self.last_wait,
+        }
+
+class JobManager:
+    """
+    Fila de análises em processo. Um número fixo de workers (IA_MAX_CONCURRENT_JOBS)
+    consome a fila, então o ThreadPoolExecutor nunca recebe mais análises do que
+    isso; com a fila cheia, submit() levanta QueueFull e a API responde 429.
+
+    Cada classe de prioridade tem a sua fila. Um worker livre sempre atende
+    primeiro os clipes ao vivo; jobs de arquivo só usam a capacidade que sobra e
+    nunca as vagas reservadas (IA_LIVE_RESERVED_SLOTS).
+    """
+    def __init__(self, runner, max_concurrent=IA_MAX_CONCURRENT_JOBS,
+                 max_queued=IA_MAX_QUEUED_JOBS, live_reserved=IA_LIVE_RESERVED_SLOTS,
+                 result_ttl=JOB_RESULT_TTL_S):
+        self.runner = runner
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+        # Pelo menos uma vaga fica disponível para arquivo, senão ele nunca roda.
+        self.live_reserved = min(max(0, live_reserved), self.max_concurrent - 1)
+        self.result_ttl = result_ttl
+        self.jobs = {}
+        self.lanes = {lane: deque() for lane in JOB_LANES}
+        self.running = {lane: 0 for lane in JOB_LANES}
+        self.lane_stats = {lane: LaneStats() for lane in JOB_LANES}
+        self._wakeup = None
+        self._workers = []
+        self._avg_duration = None
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent)]
+        logger.info(
+            f"JobManager: {self.max_concurrent} análises simultâneas "
+            f"({self.live_reserved} reservadas para ao vivo), fila de {self.max_queued} por lane."
+        )
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def capacity(self, lane: str) -> int:
+        if lane == "live":
+            return self.max_concurrent
+        return self.max_concurrent - self.live_reserved
+
+    def queued(self, lane: str) -> int:
+        return len(self.lanes[lane])
+
+    def retry_after(self, lane: str) -> int:
+        """Estimativa grosseira (s) até abrir vaga, pela duração média dos últimos jobs."""
+        avg = self._avg_duration or 10.0
+        return max(1, math.ceil(avg * (self.queued(lane) + 1) / self.capacity(lane)))
+
+    def check_capacity(self, lane: str = "live"):
+        """Levanta QueueFull antes de a API aceitar (e ler) um novo upload."""
+        if lane not in self.lanes:
+            raise ValueError(f"Prioridade desconhecida: {lane}. Use uma de {', '.join(JOB_LANES)}.")
+        if self.queued(lane) >= self.max_queued:
+            raise QueueFull(self.retry_after(lane))
+
+    def submit(self, source, cleanup=None, lane: str = "live") -> Job:
+        self._prune()
+        self.check_capacity(lane)
+        job = Job(source, cleanup, lane)
+        self.jobs[job.id] = job
+        self.lanes[lane].append(job)
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str, reason: str = "cancelado"):
+        """
+        Cancela um job. Na fila, ele sai imediatamente; em execução, o token é
+        sinalizado e o worker o encerra quando a análise atingir um ponto de checagem.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        logger.info(f"Cancelando job {job.id}: {reason}")
+        job.token.cancel(reason)
+        if job.status == "queued":
+            self.lanes[job.lane].remove(job)
+            job.status = "cancelled"
+            job.error = reason
+            job.finished_at = time.time()
+            job.done.set_exception(AnalysisCancelled(reason))
+            self._cleanup(job)
+        return job
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "live_reserved": self.live_reserved,
+            "lanes": {
+                lane: {
+                    "running": self.running[lane],
+                    "queued": self.queued(lane),
+                    **self.lane_stats[lane].to_dict(),
+                }
+                for lane in JOB_LANES
+            },
+        }
+
+    def _prune(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _next_job(self):
+        for lane in JOB_LANES:
+            if self.lanes[lane] and self.running[lane] < self.capacity(lane):
+                return self.lanes[lane].popleft()
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            self.running[job.lane] += 1
+            job.status = "running"
+            job.started_at = time.time()
+            self.lane_stats[job.lane].record(job.wait_time)
+            try:
+                job.result = await self.runner(job.source, job.token)
+                job.status = "done"
+                job.done.set_result(job.result)
+            except AnalysisCancelled as e:
+                job.error = str(e)
+                job.status = "cancelled"
+                job.done.set_exception(e)
+            except Exception as e:
+                logger.error(f"Job {job.id} falhou: {e}")
+                job.error = str(e)
+                job.status = "failed"
+                job.done.set_exception(e)
+            finally:
+                job.finished_at = time.time()
+                self.running[job.lane] -= 1
+                # Uma vaga de arquivo pode ter sido liberada para um worker ocioso.
+                self._wakeup.set()
+                if job.status == "done":
+                    self._record_duration(job.finished_at - job.started_at)
+                self._cleanup(job)
+
+    def _cleanup(self, job):
+        if job.cleanup:
+            try:
+                job.cleanup()
+            except Exception as e:
+                logger.warning(f"Erro ao limpar job {job.id}: {e}")
+
+    def _record_duration(self, duration):
+        if self._avg_duration is None:
+            self._avg_duration = duration
+        else:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
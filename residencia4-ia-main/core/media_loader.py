@@ -1,26 +1,69 @@
+import os
 import av
+import queue
+import threading
 import numpy as np
 import logging
+from core.ingest import open_container
 
 logger = logging.getLogger(__name__)
 
+SYNC_FRAME_SIZE = (224, 224)
+# O SyncNet assume vídeo a 25 fps (4 janelas MFCC de 10 ms por frame).
+SYNC_FRAME_RATE_HZ = 25.0
+# Frames em trânsito entre o Engine e o SyncNet (~150 KB no 224x224, ~700 KB no
+# frame reduzido usado pelo rastreio de rosto). Com a fila cheia, o frame loop
+# espera o SyncNet consumir: a memória não cresce com o vídeo.
+SYNC_FRAME_QUEUE = int(os.getenv("SYNC_FRAME_QUEUE", 100))
+
 class MediaLoader:
     """
-    Carrega vídeo e áudio usando PyAV para evitar I/O de disco repetitivo
-    e subprocessos do FFmpeg.
+    Contexto de mídia decodificada, compartilhado por todas as tarefas de uma requisição
+    (Engine, Lipsync e Inteligibilidade). Cada stream é decodificado uma única vez:
+    o áudio aqui, via PyAV, e o vídeo pelo frame loop do Engine, que publica os
+    frames 224x224 que o SyncNet consome.
+
+    Só o vídeo tem memória limitada (SYNC_FRAME_QUEUE). O áudio fica inteiro em
+    memória durante a requisição (float32 a 16 kHz, ~230 MB por track em 1 h):
+    os detectores de áudio e a inteligibilidade leem a track completa.
     """
     def __init__(self, file_path):
+        """
+        `file_path` pode ser um caminho ou um StreamingUpload (core.ingest). O áudio é
+        decodificado em uma thread própria, para não atrasar o início do frame loop
+        quando a entrada ainda está chegando pela rede.
+        """
         self.file_path = file_path
         self.container = None
-        self.audio_tracks = {} 
+        self.audio_tracks = {}
         self.metadata = {}
-        
+        self._audio_ready = threading.Event()
+
+        self.sync_frames = queue.Queue(maxsize=SYNC_FRAME_QUEUE)
+        self._sync_frames_wanted = False
+        self._sync_face_track = False
+        self._sync_frames_closed = threading.Event()
+        self._video_done = threading.Event()
+        # CancellationToken da requisição (core.cancellation), consultado pelas tarefas legadas.
+        self.cancel_token = None
+
         try:
-            self.container = av.open(file_path)
+            self.container = open_container(file_path)
             self._parse_metadata()
-            self._load_all_audio_tracks()
         except Exception as e:
             logger.error(f"Erro ao carregar mídia {file_path}: {e}")
+            self._audio_ready.set()
+            return
+
+        threading.Thread(target=self._load_audio_background, daemon=True).start()
+
+    def _load_audio_background(self):
+        try:
+            self._load_all_audio_tracks()
+        except Exception as e:
+            logger.error(f"Erro ao carregar áudio de {self.file_path}: {e}")
+        finally:
+            self._audio_ready.set()
 
     def _parse_metadata(self):
         self.metadata = {
@@ -39,40 +82,120 @@ class MediaLoader:
 
     def _load_all_audio_tracks(self, target_sr=16000):
         """
-        Decodifica TODOS os streams de áudio para numpy arrays (float32).
-        Padroniza para 16kHz mono para facilitar a IA.
+        Decodifica TODOS os streams de áudio para numpy arrays (float32) em uma única
+        passada de demux. Padroniza para 16kHz mono para facilitar a IA.
         """
         audio_streams = [s for s in self.container.streams if s.type == 'audio']
-        
-        for i, stream in enumerate(audio_streams):
+        if not audio_streams:
+            return
+
+        track_of = {s.index: i for i, s in enumerate(audio_streams)}
+        resamplers = {
+            i: av.AudioResampler(format='fltp', layout='mono', rate=target_sr)
+            for i in range(len(audio_streams))
+        }
+        samples = {i: [] for i in range(len(audio_streams))}
+        failed = set()
+
+        self.container.seek(0)
+        for packet in self.container.demux(*audio_streams):
+            i = track_of[packet.stream.index]
+            if i in failed:
+                continue
             try:
-                resampler = av.AudioResampler(format='fltp', layout='mono', rate=target_sr)
-                
-                samples = []
-                self.container.seek(0)
-                
-                for packet in self.container.demux(stream):
-                    for frame in packet.decode():
-                        frame.pts = None
-                        out_frames = resampler.resample(frame)
-                        for out_frame in out_frames:
-                            samples.append(out_frame.to_ndarray())
-                
-                if samples:
-                    full_track = np.concatenate(samples, axis=1).flatten()
-                    self.audio_tracks[i] = full_track
-                    logger.info(f"Áudio track {i} carregado: {len(full_track)} samples.")
-                else:
-                    self.audio_tracks[i] = np.array([])
-                    
+                for frame in packet.decode():
+                    frame.pts = None
+                    for out_frame in resamplers[i].resample(frame):
+                        samples[i].append(out_frame.to_ndarray())
             except Exception as e:
                 logger.error(f"Erro ao carregar track de áudio {i}: {e}")
+                failed.add(i)
+                samples[i] = []
+
+        for i in range(len(audio_streams)):
+            if samples[i]:
+                full_track = np.concatenate(samples[i], axis=1).flatten()
+                self.audio_tracks[i] = full_track
+                logger.info(f"Áudio track {i} carregado: {len(full_track)} samples.")
+            else:
                 self.audio_tracks[i] = np.array([])
 
     def get_audio_track(self, index: int) -> np.ndarray:
-        """Retorna o array numpy do áudio (track 0, 1, etc)."""
+        """Retorna o array numpy do áudio (track 0, 1, etc), aguardando a decodificação."""
+        self._audio_ready.wait()
         return self.audio_tracks.get(index, np.array([]))
 
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token is not None and self.cancel_token.cancelled
+
+    def request_sync_frames(self, face_track=False):
+        """
+        Pede ao Engine que publique os frames para o SyncNet: 224x224, ou o frame
+        reduzido (largura de análise) quando o rastreio de rosto vai recortá-los.
+        """
+        self._sync_frames_wanted = True
+        self._sync_face_track = face_track
+
+    @property
+    def sync_face_track(self) -> bool:
+        return self._sync_face_track
+
+    @property
+    def wants_sync_frames(self) -> bool:
+        return self._sync_frames_wanted
+
+    def add_sync_frame(self, frame):
+        """
+        Recebe o FrameBundle do Engine; o 224x224 (ou o frame reduzido) é
+        compartilhado com outros detectores. Bloqueia enquanto a fila estiver
+        cheia, até o SyncNet consumir ou desistir.
+        """
+        if self._sync_frames_closed.is_set():
+            return
+        image = frame.small if self._sync_face_track else frame.resized(*SYNC_FRAME_SIZE)
+        while not (self._sync_frames_closed.is_set() or self.cancelled):
+            try:
+                self.sync_frames.put(image, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def finish_video(self):
+        """Sinaliza que o frame loop do Engine terminou (com ou sem erro)."""
+        self._video_done.set()
+
+    def iter_sync_frames(self, timeout=None):
+        """
+        Gera os frames à medida que o Engine os publica, até o fim da
+        passada de vídeo. Sem frame novo por `timeout` segundos, encerra.
+        """
+        idle = 0.0
+        while not (self._sync_frames_closed.is_set() or self.cancelled):
+            try:
+                frame = self.sync_frames.get(timeout=0.5)
+            except queue.Empty:
+                if self._video_done.is_set() and self.sync_frames.empty():
+                    return
+                idle += 0.5
+                if timeout is not None and idle >= timeout:
+                    logger.warning("Timeout aguardando frames do Engine para o SyncNet.")
+                    return
+                continue
+            idle = 0.0
+            yield frame
+
+    def close_sync_frames(self):
+        """O SyncNet não vai mais consumir: libera o Engine e descarta a fila."""
+        self._sync_frames_closed.set()
+        while True:
+            try:
+                self.sync_frames.get_nowait()
+            except queue.Empty:
+                break
+
     def close(self):
+        self.close_sync_frames()
+        self._audio_ready.wait()
         if self.container:
-            self.container.close()
\ No newline at end of file
+            self.container.close()
@@ -0,0 +1,294 @@
+import gc
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Carrega e aquece todos os modelos em background logo após o startup.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+# Memória (MB) que os modelos residentes podem ocupar juntos; 0 = sem limite.
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", 0))
+# Um modelo usado há menos que isso (s) está em uso por alguma análise e não é descarregado.
+MODEL_MIN_IDLE_S = float(os.getenv("MODEL_MIN_IDLE_S", 5.0))
+# Enquanto um modelo carrega, os detectores guardam as amostras (no máximo este
+# tempo de vídeo, em s) em vez de parar o frame loop; passado isso, esperam a carga.
+# ~1 MB por amostra do YOLO a 5 Hz: 20 s seguram ~100 MB.
+MODEL_DEFER_MAX_S = float(os.getenv("MODEL_DEFER_MAX_S", 20.0))
+
+def _rss_mb():
+    """Memória residente do processo (MB), lida de /proc; None fora do Linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+class LazyModel:
+    """
+    Modelo carregado sob demanda, no primeiro get() ou pelo warm-up em background.
+    `loader()` constrói o modelo; `warmup(model)`, opcional, faz uma inferência
+    com entrada sintética para alocar buffers e compilar kernels antes da
+    primeira requisição real. Falhas de carregamento desativam o modelo
+    (get() retorna None), como acontecia no carregamento global.
+
+    `size_mb` é a estimativa de memória usada antes da primeira carga; depois
+    dela vale o aumento de memória residente medido durante o carregamento.
+    O ModelManager pode descarregar o modelo (estado "evicted"); o próximo
+    get() o recarrega. Enquanto houver um lease (`with model.lease() as m:`),
+    o modelo está em uso por uma inferência e nunca é descarregado.
+
+    `available` nunca bloqueia o frame loop: com o modelo ainda carregando, os
+    detectores adiam as amostras (should_defer) e só esperam a carga passado
+    MODEL_DEFER_MAX_S ou no fim do vídeo.
+    """
+    def __init__(self, name, loader, warmup=None, size_mb=0.0, manager=None):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.size_mb = size_mb
+        self.manager = manager
+        self.state = "idle"
+        self.error = None
+        self.load_time = None
+        self.last_used = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.total_load_time = 0.0
+        self.leases = 0
+        self._model = None
+        self._lock = threading.Lock()
+        self._loader_thread = None
+
+    @property
+    def resident(self) -> bool:
+        return self._model is not None
+
+    def get(self):
+        """Retorna o modelo, carregando-o se preciso (bloqueia outras threads durante a carga)."""
+        model = self._model
+        if model is not None:
+            self.hits += 1
+            self.last_used = time.monotonic()
+            return model
+        with self._lock:
+            if self._model is None and self.state != "failed":
+                self.misses += 1
+                self._load()
+            self.last_used = time.monotonic()
+            return self._model
+
+    @contextmanager
+    def lease(self):
+        """
+        Modelo (ou None) protegido contra descarga durante o bloco. O lease é
+        registrado antes do get(), sob o lock do ModelManager, para não cruzar
+        com uma descarga em andamento.
+        """
+        self._add_lease(1)
+        try:
+            yield self.get()
+        finally:
+            self._add_lease(-1)
+
+    def _add_lease(self, delta):
+        lock = self.manager._lock if self.manager is not None else self._lock
+        with lock:
+            self.leases += delta
+
+    @property
+    def available(self) -> bool:
+        """
+        Consultado a cada frame, sem bloquear: True se o modelo está em memória ou
+        ainda pode ser carregado. Fora de memória, dispara a carga em background
+        (load_async); enquanto isso os detectores adiam as amostras (should_defer).
+        Não conta como acesso nas estatísticas.
+        """
+        if self._model is not None:
+            return True
+        if self.state == "failed":
+            return False
+        self.load_async()
+        return True
+
+    def load_async(self):
+        """Carrega o modelo em uma thread, se ninguém (warm-up incluso) já o estiver carregando."""
+        if self._model is not None or self.state in ("loading", "failed"):
+            return
+        if self._loader_thread is None or not self._loader_thread.is_alive():
+            self._loader_thread = threading.Thread(target=self.get, daemon=True)
+            self._loader_thread.start()
+
+    def should_defer(self, waited_s) -> bool:
+        """
+        True se a amostra deve ser guardada para depois: o modelo ainda não está em
+        memória, pode carregar, e a amostra mais antiga guardada tem menos de
+        MODEL_DEFER_MAX_S segundos de vídeo (`waited_s`).
+        """
+        return self._model is None and self.available and waited_s < MODEL_DEFER_MAX_S
+
+    def _load(self):
+        if self.manager is not None:
+            self.manager.make_room(self)
+        self.state = "loading"
+        start = time.perf_counter()
+        rss_before = _rss_mb()
+        logger.info(f"Carregando modelo {self.name}...")
+        try:
+            model = self.loader()
+            if self.warmup is not None:
+                self.warmup(model)
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.warning(f"Modelo {self.name} não carregado: {e}")
+            return
+        rss_after = _rss_mb()
+        # Medição ruidosa (outras threads também alocam): só substitui a estimativa se for positiva.
+        if rss_before is not None and rss_after is not None and rss_after > rss_before:
+            self.size_mb = rss_after - rss_before
+        self._model = model
+        self.load_time = time.perf_counter() - start
+        self.total_load_time += self.load_time
+        self.loads += 1
+        self.state = "ready"
+        logger.info(f"Modelo {self.name} pronto em {self.load_time:.1f}s (~{self.size_mb:.0f} MB).")
+
+    def evict(self):
+        """Descarta o modelo; a memória volta quando nenhuma análise mantiver referência a ele."""
+        self.state = "evicted"
+        self._model = None
+        self.evictions += 1
+        logger.info(f"Modelo {self.name} descarregado (~{self.size_mb:.0f} MB).")
+
+    def status(self):
+        return {"state": self.state, "load_time_s": self.load_time, "error": self.error}
+
+    def stats(self):
+        return {
+            **self.status(),
+            "size_mb": self.size_mb,
+            "resident": self.resident,
+            "leases": self.leases,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "total_load_time_s": self.total_load_time,
+        }
+
+class ModelManager:
+    """
+    Residência dos modelos sob um orçamento de memória (MODEL_MEMORY_BUDGET_MB).
+    Antes de carregar um modelo, descarrega os residentes menos usados
+    recentemente (LRU) até a estimativa caber. Modelos com lease ativo (em
+    inferência) ou usados nos últimos MODEL_MIN_IDLE_S segundos não são
+    descarregados; se nem assim couber, a carga segue acima do orçamento e um
+    aviso é registrado.
+    """
+    def __init__(self, budget_mb=MODEL_MEMORY_BUDGET_MB, min_idle_s=MODEL_MIN_IDLE_S):
+        self.budget_mb = budget_mb
+        self.min_idle_s = min_idle_s
+        self.models = {}
+        self._lock = threading.Lock()
+        self._warmup_done = threading.Event()
+        if not MODEL_WARMUP:
+            self._warmup_done.set()
+
+    def register(self, name, loader, warmup=None, size_mb=0.0) -> LazyModel:
+        model = LazyModel(name, loader, warmup, size_mb=size_mb, manager=self)
+        self.models[name] = model
+        return model
+
+    @property
+    def used_mb(self) -> float:
+        return sum(m.size_mb for m in self.models.values() if m.resident)
+
+    def fits(self, model: LazyModel) -> bool:
+        return self.budget_mb <= 0 or self.used_mb + model.size_mb <= self.budget_mb
+
+    def make_room(self, model: LazyModel):
+        if self.budget_mb <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            candidates = sorted(
+                (m for m in self.models.values()
+                 if m is not model and m.resident and m.leases == 0
+                 and now - m.last_used >= self.min_idle_s),
+                key=lambda m: m.last_used
+            )
+            evicted = False
+            for victim in candidates:
+                if self.fits(model):
+                    break
+                victim.evict()
+                evicted = True
+            if evicted:
+                gc.collect()
+                _empty_device_cache()
+            if not self.fits(model):
+                logger.warning(
+                    f"Modelo {model.name} (~{model.size_mb:.0f} MB) excede o orçamento de "
+                    f"{self.budget_mb:.0f} MB ({self.used_mb:.0f} MB em uso); carregando mesmo assim."
+                )
+
+    def warmup(self):
+        """
+        Carrega e aquece os modelos registrados, um de cada vez (chamado em uma thread).
+        Com orçamento, pula os modelos que não cabem: o warm-up não descarrega
+        modelos para abrir espaço.
+        """
+        try:
+            for model in list(self.models.values()):
+                if model.resident or model.state == "failed":
+                    continue
+                if not self.fits(model):
+                    logger.info(f"Warm-up: {model.name} não cabe no orçamento; fica para a primeira requisição.")
+                    continue
+                model.get()
+        finally:
+            self._warmup_done.set()
+
+    def ready(self) -> bool:
+        """Pronto quando o warm-up terminou e nenhum modelo está carregando."""
+        return self._warmup_done.is_set() and not any(m.state == "loading" for m in self.models.values())
+
+    def status(self):
+        return {name: model.status() for name, model in self.models.items()}
+
+    def stats(self):
+        return {
+            "budget_mb": self.budget_mb,
+            "used_mb": self.used_mb,
+            "models": {name: model.stats() for name, model in self.models.items()},
+        }
+
+def _empty_device_cache():
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+MODEL_MANAGER = ModelManager()
+
+def register_model(name, loader, warmup=None, size_mb=0.0) -> LazyModel:
+    return MODEL_MANAGER.register(name, loader, warmup, size_mb)
+
+def warmup_models():
+    MODEL_MANAGER.warmup()
+
+def models_ready() -> bool:
+    return MODEL_MANAGER.ready()
+
+def models_status():
+    return MODEL_MANAGER.status()
+
+def models_stats():
+    return MODEL_MANAGER.stats()
@@ -0,0 +1,153 @@
+import os
+import cv2
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Diferença média (níveis de cinza) em um bloco da miniatura, ou em uma caixa de
+# texto, a partir da qual o frame é considerado alterado.
+OCR_GATE_THRESHOLD = float(os.getenv("OCR_GATE_THRESHOLD", 3.0))
+# Tempo máximo (s) reaproveitando o mesmo OCR antes de forçar uma nova leitura.
+# Com amostras a cada 0,6 s (OCR_RATE_HZ), 3 s poupam até 4 de cada 5 leituras.
+# É seguro porque o gate por bloco já força o OCR quando surge um elemento novo,
+# e o teto fica abaixo dos 4 s mínimos de uma falha de texto: uma mudança que
+# escape do gate ainda é lida antes de poder virar ocorrência.
+OCR_GATE_MAX_REUSE_S = float(os.getenv("OCR_GATE_MAX_REUSE_S", 3.0))
+SIGNATURE_SIZE = (64, 36)
+# Blocos de 4x4 px da miniatura: ~40x40 px do frame reduzido de 640 px.
+SIGNATURE_TILE = 4
+
+class OcrSample:
+    """O que o OCR lê de um FrameBundle: amostras adiadas não prendem o bundle inteiro."""
+    def __init__(self, frame):
+        self.small = frame.small
+        self.small_gray = frame.small_gray
+
+class OcrService:
+    """
+    Serviço de OCR do Engine: executa o EasyOCR no máximo uma vez por frame
+    amostrado e entrega as mesmas caixas a todos os detectores de texto.
+
+    Gate de mudança: antes de rodar o OCR, compara uma assinatura barata do frame
+    (miniatura em cinza) e os recortes das caixas de texto do último OCR com os do
+    frame atual. A miniatura é comparada bloco a bloco, e basta um bloco mudar
+    para invalidar o resultado: um elemento pequeno novo (uma linha de GC, uma
+    arte) quase não move a média do frame inteiro. Se nada mudou, o resultado
+    anterior é reaproveitado por no máximo `max_reuse_s` segundos.
+
+    `model` é o LazyModel do EasyOCR (core.models): carregado só quando um
+    detector de texto pede o primeiro OCR. Enquanto ele carrega, defer() guarda a
+    amostra (só o frame reduzido) e o detector busca o resultado depois, em ordem,
+    com deferred_results(); o frame loop não espera a carga.
+    """
+    def __init__(self, model, gate_threshold=OCR_GATE_THRESHOLD, max_reuse_s=OCR_GATE_MAX_REUSE_S):
+        self.model = model
+        self.gate_threshold = gate_threshold
+        self.max_reuse_s = max_reuse_s
+        self.calls = 0
+        self.reused = 0
+        self.requests = 0
+        # Timestamp do último frame atendido: não guarda o FrameBundle (e as
+        # conversões em cache dele) além do frame loop.
+        self._timestamp = None
+        self._results = []
+        self._signature = None
+        self._regions = []
+        self._ocr_time = None
+        # timestamp -> {"sample", "results", "consumers"}, em ordem de chegada.
+        self._deferred = {}
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None and self.model.available
+
+    def readtext(self, frame, timestamp):
+        """Retorna [(bbox, texto, prob), ...] do frame reduzido (coordenadas de frame.small)."""
+        self.requests += 1
+        if timestamp == self._timestamp:
+            return self._results
+        self._timestamp = timestamp
+
+        gray = frame.small_gray
+        signature = cv2.resize(gray, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+        if self._unchanged(gray, signature, timestamp):
+            self.reused += 1
+            return self._results
+
+        with self.model.lease() as reader:
+            if reader is None:
+                return []
+            self._results = reader.readtext(frame.small, detail=1, paragraph=False)
+        self._signature = signature
+        self._regions = [(box, gray[box].astype(np.int16)) for box in self._text_boxes(gray.shape)]
+        self._ocr_time = timestamp
+        self.calls += 1
+        return self._results
+
+    def defer(self, frame, timestamp) -> bool:
+        """Adia o OCR desta amostra se o EasyOCR ainda não está em memória (ver LazyModel.should_defer)."""
+        waited = timestamp - next(iter(self._deferred)) if self._deferred else 0.0
+        if not self.model.should_defer(waited):
+            return False
+        entry = self._deferred.get(timestamp)
+        if entry is None:
+            entry = self._deferred[timestamp] = {"sample": OcrSample(frame), "results": None, "consumers": 0}
+        entry["consumers"] += 1
+        return True
+
+    def deferred_results(self, timestamp):
+        """
+        Resultado de uma amostra adiada (bloqueia até o EasyOCR carregar). As amostras
+        adiadas até ela são lidas em ordem, para o gate comparar frames consecutivos;
+        cada uma é descartada quando todos os detectores que a adiaram a consumiram.
+        """
+        entry = self._deferred[timestamp]
+        if entry["sample"] is not None:
+            for ts, pending in self._deferred.items():
+                if pending["sample"] is not None:
+                    pending["results"] = self.readtext(pending["sample"], ts)
+                    pending["sample"] = None
+                if ts == timestamp:
+                    break
+        entry["consumers"] -= 1
+        if entry["consumers"] == 0:
+            del self._deferred[timestamp]
+        return entry["results"]
+
+    def _text_boxes(self, shape):
+        h, w = shape[:2]
+        boxes = []
+        for (bbox, _, _) in self._results:
+            xs = [p[0] for p in bbox]
+            ys = [p[1] for p in bbox]
+            x1, x2 = max(0, int(min(xs))), min(w, int(max(xs)) + 1)
+            y1, y2 = max(0, int(min(ys))), min(h, int(max(ys)) + 1)
+            if x2 > x1 and y2 > y1:
+                boxes.append((slice(y1, y2), slice(x1, x2)))
+        return boxes
+
+    def _unchanged(self, gray, signature, timestamp):
+        if self._signature is None or timestamp - self._ocr_time >= self.max_reuse_s:
+            return False
+        if self._max_tile_diff(signature) >= self.gate_threshold:
+            return False
+        for box, crop in self._regions:
+            current = gray[box]
+            if current.shape != crop.shape:
+                return False
+            if np.mean(np.abs(current.astype(np.int16) - crop)) >= self.gate_threshold:
+                return False
+        return True
+
+    def _max_tile_diff(self, signature):
+        diff = np.abs(signature - self._signature)
+        h, w = diff.shape
+        t = SIGNATURE_TILE
+        tiles = diff[:h - h % t, :w - w % t].reshape(h // t, t, w // t, t)
+        return float(tiles.mean(axis=(1, 3)).max())
+
+    def log_stats(self):
+        if self.requests:
+            logger.info(f"OCR: {self.calls} execuções, {self.reused} reaproveitadas, {self.requests} pedidos.")
@@ -0,0 +1,70 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Runtime de inferência padrão: "native" (PyTorch/TensorFlow) ou "onnx" (ONNX Runtime).
+# Cada modelo pode sobrescrever com <NOME>_BACKEND (ex.: MOBILENET_BACKEND=onnx).
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "native")
+# Grafos gerados por export_onnx.py.
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join("models", "onnx"))
+# Modelos ONNX rodados com quantização dinâmica int8 na CPU (pesos int8, ativações
+# quantizadas em tempo de execução). Rende mais nos modelos dominados por MatMul.
+ONNX_INT8_MODELS = {m.strip() for m in os.getenv("ONNX_INT8_MODELS", "wav2vec2").split(",") if m.strip()}
+# Threads intra-op do ONNX Runtime; 0 deixa o runtime decidir.
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", 0))
+
+def model_backend(name: str) -> str:
+    return os.getenv(f"{name.upper()}_BACKEND", INFERENCE_BACKEND)
+
+def _providers():
+    import onnxruntime as ort
+    available = ort.get_available_providers()
+    return [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in available]
+
+def quantize_int8(path: str) -> str:
+    """Versão int8 (quantização dinâmica) do grafo, gerada uma vez e guardada ao lado do original."""
+    out = path[:-len(".onnx")] + ".int8.onnx"
+    if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        logger.info(f"Quantizando {path} para int8...")
+        quantize_dynamic(path, out, weight_type=QuantType.QInt8)
+    return out
+
+def onnx_file(name: str, quantize_key: str = None) -> str:
+    """
+    Caminho do grafo ONNX de `name` em ONNX_MODEL_DIR, trocado pela versão int8
+    quando o modelo está em ONNX_INT8_MODELS e a inferência é na CPU (os
+    operadores int8 dinâmicos não rodam no provider CUDA).
+    """
+    path = os.path.join(ONNX_MODEL_DIR, f"{name}.onnx")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Grafo ONNX não encontrado em '{path}'. Gere com: python export_onnx.py")
+    if (quantize_key or name) in ONNX_INT8_MODELS:
+        if "CUDAExecutionProvider" in _providers():
+            logger.info(f"{name}: inferência na GPU, quantização int8 ignorada.")
+        else:
+            path = quantize_int8(path)
+    return path
+
+class OnnxRunner:
+    """
+    Sessão do ONNX Runtime com a mesma cara de uma chamada de modelo:
+    runner(*entradas) -> lista de saídas (numpy), entradas na ordem do grafo.
+    """
+    def __init__(self, path: str):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS > 0:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=_providers())
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        logger.info(f"ONNX Runtime: {path} ({', '.join(self.session.get_providers())}).")
+
+    def __call__(self, *inputs):
+        return self.session.run(None, dict(zip(self.input_names, inputs)))
+
+def load_onnx(name: str, quantize_key: str = None) -> OnnxRunner:
+    return OnnxRunner(onnx_file(name, quantize_key))
@@ -2,60 +2,96 @@ import cv2
 import numpy as np
 import logging
 import torch
-import easyocr
 import os
 import json
-from scipy.spatial.distance import cosine
+from typing import Optional
 from scipy.stats import pearsonr
 from scipy.fft import rfft, rfftfreq, irfft
-from ultralytics import YOLO
-from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, preprocess_input
 from core.interfaces import VideoDetector, AudioDetector
+from core.models import register_model
+from core.runtime import model_backend, onnx_file, load_onnx
+from detectors.logo_library import LogoLibrary
 from utils.error_classifier import classify_error, get_current_program
 
 logger = logging.getLogger(__name__)
 
-# =========================================================================
-# CARREGAMENTO DE MODELOS GLOBAIS (SINGLETON)
-# =========================================================================
-EASYOCR_READER = None
-try:
-    logger.info("Carregando EasyOCR (Global)...")
-    EASYOCR_READER = easyocr.Reader(['pt'], gpu=torch.cuda.is_available())
-except Exception as e:
-    logger.warning(f"EasyOCR não carregado: {e}")
-
-YOLO_MODEL = None
-try:
-    logger.info("Carregando YOLO (Global)...")
-    YOLO_MODEL = YOLO("yolov8n.pt")
-except Exception as e:
-    logger.warning(f"YOLO não carregado: {e}")
-
-MOBILENET_MODEL = None
-try:
-    logger.info("Carregando MobileNetV2 (Global)...")
-    MOBILENET_MODEL = MobileNetV2(weights='imagenet', include_top=False, pooling='avg')
-except Exception as e:
-    logger.warning(f"MobileNetV2 não carregado: {e}")
+YOLO_BATCH_SIZE = int(os.getenv("YOLO_BATCH_SIZE", 8))
+YOLO_IMGSZ = int(os.getenv("YOLO_IMGSZ", 480))
+MOBILENET_BATCH_SIZE = int(os.getenv("MOBILENET_BATCH_SIZE", 32))
+# Estimação de movimento do Repórter Parado: "farneback" (denso) ou "lk" (esparso).
+REPORTER_MOTION_METHOD = os.getenv("REPORTER_MOTION_METHOD", "farneback")
+REPORTER_MOTION_MAX_SIDE = int(os.getenv("REPORTER_MOTION_MAX_SIDE", 160))
+# Taxa comum dos detectores de texto: ficam alinhados nos mesmos frames e
+# compartilham uma única execução de OCR por frame amostrado. É a taxa original
+# do Artes Sobrepostas (1 a cada 15 frames a 25 fps); o Safe Area desceu para ela.
+OCR_RATE_HZ = 25.0 / 15
 
 SCHEDULE_PATH = "../utils/programacao_globo_2025.json"
 TEMPLATE_PATH = os.path.join("models", "templates", "logo_globo.png")
+LOGO_SCALES = np.linspace(0.4, 1.2, 10)
 
 # =========================================================================
-# DETECTORES DE VÍDEO (PROCESSAMENTO FRAME A FRAME)
+# MODELOS (CARREGADOS SOB DEMANDA, AQUECIDOS EM BACKGROUND NO STARTUP)
 # =========================================================================
+def _load_easyocr():
+    import easyocr
+    return easyocr.Reader(['pt'], gpu=torch.cuda.is_available())
+
+def _warm_easyocr(reader):
+    reader.readtext(np.zeros((64, 256, 3), dtype=np.uint8))
+
+def _load_yolo():
+    from ultralytics import YOLO
+    if model_backend("yolo") == "onnx":
+        # O ultralytics roda o grafo exportado via ONNX Runtime com a mesma API de resultados.
+        return YOLO(onnx_file("yolo"), task="detect")
+    return YOLO("yolov8n.pt")
+
+def _warm_yolo(model):
+    model(np.zeros((YOLO_IMGSZ, YOLO_IMGSZ, 3), dtype=np.uint8), classes=[0], verbose=False, imgsz=YOLO_IMGSZ)
+
+def _load_mobilenet():
+    """Retorna embed(lote NHWC float32 em [-1, 1]) -> embeddings (N, 1280)."""
+    if model_backend("mobilenet") == "onnx":
+        runner = load_onnx("mobilenet")
+        return lambda arr: runner(arr)[0]
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+    model = MobileNetV2(weights='imagenet', include_top=False, pooling='avg')
+    # Chamada direta ao modelo: evita o overhead fixo de predict() por lote.
+    return lambda arr: np.asarray(model(arr, training=False))
+
+def _warm_mobilenet(embed):
+    embed(np.zeros((1, 224, 224, 3), dtype=np.float32))
+
+# size_mb: estimativa de memória residente até a primeira carga medir o valor real.
+EASYOCR_MODEL = register_model("easyocr", _load_easyocr, _warm_easyocr, size_mb=300)
+YOLO_MODEL = register_model("yolo", _load_yolo, _warm_yolo, size_mb=80)
+MOBILENET_MODEL = register_model("mobilenet", _load_mobilenet, _warm_mobilenet, size_mb=500)
+
+_LOGO_LIBRARY = None
+
+def get_logo_library():
+    """Biblioteca de logos (template principal + models/templates/logos), montada uma vez por processo."""
+    global _LOGO_LIBRARY
+    if _LOGO_LIBRARY is None:
+        _LOGO_LIBRARY = LogoLibrary.from_directory(TEMPLATE_PATH, LOGO_SCALES)
+    return _LOGO_LIBRARY
 
+# =========================================================================
+# DETECTORES DE VÍDEO (PROCESSAMENTO FRAME A FRAME)
+# =========================================================================
 class FreezeDetectorV2(VideoDetector):
     def __init__(self):
         super().__init__("Freeze")
+        self.analysis_rate_hz = 25.0
+        self.required_features = ("laplacian_var",)
         self.threshold = 50.0
         self.min_duration = 4.0
         self.static_count = 0
         self.potential_start = 0
 
-    def process_frame(self, full_frame, small_frame, small_gray, timestamp, frame_idx):
-        laplacian_var = cv2.Laplacian(small_gray, cv2.CV_64F).var()
+    def process_frame(self, frame, timestamp, frame_idx):
+        laplacian_var = frame.features["laplacian_var"]
         
         if laplacian_var < self.threshold:
             if self.static_count == 0:
@@ -66,7 +102,7 @@ class FreezeDetectorV2(VideoDetector):
             self.static_count = 0
 
     def _check_and_record(self):
-        duration = self.static_count * 0.04  
+        duration = self.static_count * self.sample_interval
         if duration >= self.min_duration:
             self.errors.append({
                 "fault_type": "Freeze/Efeito Bloco",
@@ -80,13 +116,15 @@ class FreezeDetectorV2(VideoDetector):
 class SignalCutDetectorV2(VideoDetector):
     def __init__(self):
         super().__init__("Corte de Sinal")
+        self.analysis_rate_hz = 25.0
+        self.required_features = ("brightness",)
         self.threshold = 15.0
         self.min_duration = 4.0
         self.black_count = 0
         self.start_time = 0
 
-    def process_frame(self, full_frame, small_frame, small_gray, timestamp, frame_idx):
-        brightness = np.mean(small_gray)
+    def process_frame(self, frame, timestamp, frame_idx):
+        brightness = frame.features["brightness"]
         
         if brightness < self.threshold:
             if self.black_count == 0:
@@ -107,66 +145,93 @@ class SignalCutDetectorV2(VideoDetector):
             self.black_count = 0
 
 class LogoDetectorV2(VideoDetector):
-    def __init__(self):
+    """
+    Template matching multi-escala com a pirâmide (template + máscara por escala)
+    montada uma única vez, para cada logo da LogoLibrary. Depois de um acerto, o
+    detector fica travado no logo e na escala encontrados e busca só numa janela
+    em torno do último acerto. Quando o logo é perdido, a biblioteca indica qual
+    logo válido parece estar no recorte, mas a presença só conta se a varredura
+    por template confirmar; sem confirmação, varre o template principal e os logos
+    que ficaram fora do índice ORB.
+    """
+    def __init__(self, library: Optional[LogoLibrary] = None):
         super().__init__("Logo Errado")
-        self.template = None
-        self.mask = None
-        self.load_template()
+        self.primary = os.path.splitext(os.path.basename(TEMPLATE_PATH))[0]
+        self.library = library if library is not None else get_logo_library()
         self.missing_count = 0
         self.start_time = 0
         self.min_duration = 4.0
-        self.frame_skip = 15  
+        self.analysis_rate_hz = 25.0 / 5
         self.match_threshold = 0.1
         self.roi_y_start = 0.0
         self.roi_y_end = 0.20
         self.roi_x_start = 0.75
         self.roi_x_end = 1.0
-        self.scales = np.linspace(0.4, 1.2, 10)
-
-    def load_template(self):
-        if os.path.exists(TEMPLATE_PATH):
-            img = cv2.imread(TEMPLATE_PATH)
-            if img is not None:
-                self.template = img
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                _, self.mask = cv2.threshold(gray, 210, 255, cv2.THRESH_BINARY)
-                self.t_h, self.t_w = img.shape[:2]
-            else:
-                logger.error(f"Não foi possível ler template em {TEMPLATE_PATH}")
-
-    def process_frame(self, full_frame, small_frame, small_gray, timestamp, frame_idx):
-        if self.template is None or frame_idx % self.frame_skip != 0:
+        self.search_margin = 0.5
+        self.locked_logo = None
+        self.locked_level = None
+        self.locked_pos = None
+
+    def _match(self, image, logo, level):
+        """Retorna a posição (x, y) do melhor acerto abaixo do limiar, ou None."""
+        templ, mask = self.library.pyramids[logo][level]
+        th, tw = templ.shape[:2]
+        if th > image.shape[0] or tw > image.shape[1]:
+            return None
+        try:
+            res = cv2.matchTemplate(image, templ, cv2.TM_SQDIFF_NORMED, mask=mask)
+            min_val, _, min_loc, _ = cv2.minMaxLoc(res)
+        except Exception:
+            return None
+        return min_loc if min_val <= self.match_threshold else None
+
+    def _match_locked(self, roi):
+        templ = self.library.pyramids[self.locked_logo][self.locked_level][0]
+        th, tw = templ.shape[:2]
+        mx, my = int(tw * self.search_margin), int(th * self.search_margin)
+        x, y = self.locked_pos
+        x1, y1 = max(0, x - mx), max(0, y - my)
+        x2, y2 = min(roi.shape[1], x + tw + mx), min(roi.shape[0], y + th + my)
+        loc = self._match(roi[y1:y2, x1:x2], self.locked_logo, self.locked_level)
+        if loc is None:
+            return False
+        self.locked_pos = (x1 + loc[0], y1 + loc[1])
+        return True
+
+    def _full_scan(self, roi, logo):
+        for level in range(len(self.library.pyramids[logo])):
+            loc = self._match(roi, logo, level)
+            if loc is not None:
+                self.locked_logo, self.locked_level, self.locked_pos = logo, level, loc
+                return True
+        return False
+
+    def _search(self, roi):
+        if self.locked_logo is not None and self._match_locked(roi):
+            return True
+        self.locked_logo, self.locked_level, self.locked_pos = None, None, None
+
+        # A biblioteca (ORB) só escolhe o candidato; quem confirma a presença é o template.
+        logo = self.library.identify(roi)
+        if logo is not None and logo != self.primary and self._full_scan(roi, logo):
+            return True
+
+        if self.primary in self.library.pyramids and self._full_scan(roi, self.primary):
+            return True
+        # Logos fora do índice ORB nunca saem do identify(): varre cada um por template.
+        return any(self._full_scan(roi, name) for name in self.library.unindexed
+                   if name != self.primary)
+
+    def process_frame(self, frame, timestamp, frame_idx):
+        if not len(self.library):
             return
 
-        h, w = full_frame.shape[:2]
-        y1, y2 = int(h * self.roi_y_start), int(h * self.roi_y_end)
-        x1, x2 = int(w * self.roi_x_start), int(w * self.roi_x_end)
-        
-        roi = full_frame[y1:y2, x1:x2]
-        roi_h, roi_w = roi.shape[:2]
-        
-        found = False
-        for scale in self.scales:
-            tw, th = int(self.t_w * scale), int(self.t_h * scale)
-            
-            if th > roi_h or tw > roi_w or th == 0 or tw == 0: 
-                continue
-            
-            resized_t = cv2.resize(self.template, (tw, th), interpolation=cv2.INTER_AREA)
-            resized_m = cv2.resize(self.mask, (tw, th), interpolation=cv2.INTER_AREA)
-            
-            try:
-                res = cv2.matchTemplate(roi, resized_t, cv2.TM_SQDIFF_NORMED, mask=resized_m)
-                min_val, _, _, _ = cv2.minMaxLoc(res)
-                if min_val <= self.match_threshold:
-                    found = True
-                    break
-            except: continue
-
-        if not found:
+        roi = frame.roi(self.roi_y_start, self.roi_y_end, self.roi_x_start, self.roi_x_end)
+
+        if not self._search(roi):
             if self.missing_count == 0: 
                 self.start_time = timestamp
-            self.missing_count += self.frame_skip
+            self.missing_count += 1
         else:
             self._close_occurrence(timestamp)
 
@@ -174,7 +239,7 @@ class LogoDetectorV2(VideoDetector):
         """Método auxiliar para registrar a ocorrência."""
         if self.missing_count > 0:
 
-            duration = self.missing_count * (1.0/25.0) 
+            duration = self.missing_count * self.sample_interval
         
             if end_time is not None:
                 duration = end_time - self.start_time
@@ -200,21 +265,51 @@ class LogoDetectorV2(VideoDetector):
             
         return self.errors
 
-class SafeAreaDetectorV2(VideoDetector):
+class OcrDetectorV2(VideoDetector):
+    """
+    Base dos detectores de texto: pedem o OCR ao OcrService do Engine e tratam o
+    resultado em process_ocr(). Enquanto o EasyOCR carrega, as amostras ficam
+    adiadas no OcrService e são processadas em ordem assim que ele fica pronto
+    (ou no finish), sem parar o frame loop.
+    """
+    def __init__(self, name):
+        super().__init__(name)
+        self.uses_ocr = True
+        self.analysis_rate_hz = OCR_RATE_HZ
+        self.deferred = []
+
+    def process_frame(self, frame, timestamp, frame_idx):
+        if self.ocr is None or not self.ocr.available:
+            return
+        if self.ocr.defer(frame, timestamp):
+            self.deferred.append((timestamp, frame.small_width, frame.small_height))
+            return
+        self._drain()
+        self.process_ocr(self.ocr.readtext(frame, timestamp), timestamp, frame.small_width, frame.small_height)
+
+    def finish(self):
+        if self.ocr is not None:
+            self._drain()
+
+    def _drain(self):
+        deferred, self.deferred = self.deferred, []
+        for timestamp, width, height in deferred:
+            self.process_ocr(self.ocr.deferred_results(timestamp), timestamp, width, height)
+
+    def process_ocr(self, results, timestamp, width, height):
+        """Trata as caixas [(bbox, texto, prob), ...] do frame reduzido (width x height)."""
+        raise NotImplementedError
+
+class SafeAreaDetectorV2(OcrDetectorV2):
     def __init__(self):
         super().__init__("Safe Area")
-        self.frame_skip = 10
         self.margin_pct = 0.05
         self.fault_count = 0
         self.start_time = 0
         self.last_text = ""
 
-    def process_frame(self, full_frame, small_frame, small_gray, timestamp, frame_idx):
-        if EASYOCR_READER is None or frame_idx % self.frame_skip != 0:
-            return
-
-        results = EASYOCR_READER.readtext(small_frame, detail=1, paragraph=False)
-        h, w = small_frame.shape[:2]
+    def process_ocr(self, results, timestamp, width, height):
+        h, w = height, width
         
         margin_x, margin_y = w * self.margin_pct, h * self.margin_pct
         min_x, max_x = margin_x, w - margin_x
@@ -236,7 +331,7 @@ class SafeAreaDetectorV2(VideoDetector):
             if self.fault_count == 0: self.start_time = timestamp
             self.fault_count += 1
         else:
-            duration = self.fault_count * (self.frame_skip / 25.0)
+            duration = self.fault_count * self.sample_interval
             if duration >= 4.0:
                 self.errors.append({
                     "fault_type": "Arte Fora da Safe Area",
@@ -249,51 +344,126 @@ class SafeAreaDetectorV2(VideoDetector):
             self.fault_count = 0
 
 class ReporterParadoDetectorV2(VideoDetector):
+    """
+    Acumula as amostras em micro-lotes e faz uma única chamada YOLO por lote
+    (sobre o frame reduzido, com imgsz menor); a máquina de estados é reexecutada
+    em ordem sobre os resultados do lote.
+
+    O movimento é estimado só no recorte da pessoa (com margem), limitado a
+    `motion_max_side` pixels: Farneback denso ou Lucas-Kanade esparso em keypoints
+    da caixa (`motion_method`). A magnitude é convertida para pixels da resolução
+    original, mantendo o significado de `motion_threshold`.
+    """
     def __init__(self):
         super().__init__("Reporter Parado")
-        self.frame_skip = 5
+        self.analysis_rate_hz = 25.0 / 5
+        self.batch_size = YOLO_BATCH_SIZE
+        self.imgsz = YOLO_IMGSZ
+        self.pending = []
         self.still_count = 0
         self.prev_gray = None
         self.start_time = 0
         self.motion_threshold = 2.5
+        self.motion_method = REPORTER_MOTION_METHOD
+        self.motion_max_side = REPORTER_MOTION_MAX_SIDE
+        self.roi_padding = 0.15
         self.min_duration = 4.0
 
-    def process_frame(self, full_frame, small_frame, small_gray, timestamp, frame_idx):
-        if YOLO_MODEL is None or frame_idx % self.frame_skip != 0:
+    def process_frame(self, frame, timestamp, frame_idx):
+        if not YOLO_MODEL.available:
             return
 
-        current_gray = cv2.cvtColor(full_frame, cv2.COLOR_BGR2GRAY)
+        current_gray = frame.small_gray
 
-        if self.prev_gray is None:
+        if self.prev_gray is None or self.prev_gray.shape != current_gray.shape:
             self.prev_gray = current_gray
             return
 
-        if self.prev_gray.shape != current_gray.shape:
-            self.prev_gray = current_gray
-            return
+        to_full = frame.width / float(frame.small_width)
+        self.pending.append((frame.small, self.prev_gray, current_gray, to_full, timestamp))
+        self.prev_gray = current_gray
 
-        results = YOLO_MODEL(full_frame, classes=[0], verbose=False, conf=0.5)
-        is_still = False
-        
-        if len(results[0].boxes) > 0:
-            boxes = results[0].boxes.xyxy.cpu().numpy().astype(int)
-            areas = [(b[2]-b[0])*(b[3]-b[1]) for b in boxes]
-            idx = np.argmax(areas)
-            x1, y1, x2, y2 = boxes[idx]
-            mask = np.zeros_like(current_gray)
-            mask[y1:y2, x1:x2] = 255
-            flow = cv2.calcOpticalFlowFarneback(self.prev_gray, current_gray, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+        # Com o YOLO ainda carregando, as amostras se acumulam (ver LazyModel.should_defer).
+        if len(self.pending) >= self.batch_size and not YOLO_MODEL.should_defer(timestamp - self.pending[0][4]):
+            self._flush()
+
+    def finish(self):
+        self._flush()
+
+    def _flush(self):
+        while self.pending:
+            batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+
+            with YOLO_MODEL.lease() as model:
+                if model is None:
+                    self.pending = []
+                    return
+                results = model(
+                    [item[0] for item in batch], classes=[0], verbose=False, conf=0.5, imgsz=self.imgsz
+                )
+            for (_, prev_gray, current_gray, to_full, timestamp), result in zip(batch, results):
+                self._update_state(self._is_still(result, prev_gray, current_gray, to_full), timestamp)
+
+    def _is_still(self, result, prev_gray, current_gray, to_full):
+        if len(result.boxes) == 0:
+            return False
+
+        boxes = result.boxes.xyxy.cpu().numpy().astype(int)
+        areas = [(b[2]-b[0])*(b[3]-b[1]) for b in boxes]
+        idx = np.argmax(areas)
+        mean_motion = self._roi_motion(prev_gray, current_gray, boxes[idx])
+        if mean_motion is None:
+            return False
+        
+        return mean_motion * to_full < self.motion_threshold
+
+    def _roi_motion(self, prev_gray, current_gray, box):
+        """Movimento médio dentro da caixa, em pixels do frame de entrada."""
+        h, w = current_gray.shape[:2]
+        x1, y1, x2, y2 = box
+        pad_x, pad_y = int((x2 - x1) * self.roi_padding), int((y2 - y1) * self.roi_padding)
+        rx1, ry1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+        rx2, ry2 = min(w, x2 + pad_x), min(h, y2 + pad_y)
+        if rx2 - rx1 < 8 or ry2 - ry1 < 8:
+            return None
+
+        prev_roi = prev_gray[ry1:ry2, rx1:rx2]
+        curr_roi = current_gray[ry1:ry2, rx1:rx2]
+        scale = min(1.0, self.motion_max_side / float(max(rx2 - rx1, ry2 - ry1)))
+        if scale < 1.0:
+            size = (max(8, int((rx2 - rx1) * scale)), max(8, int((ry2 - ry1) * scale)))
+            prev_roi = cv2.resize(prev_roi, size, interpolation=cv2.INTER_AREA)
+            curr_roi = cv2.resize(curr_roi, size, interpolation=cv2.INTER_AREA)
+
+        # Caixa sem margem, em coordenadas do recorte reduzido.
+        mask = np.zeros_like(curr_roi)
+        mask[int((y1 - ry1) * scale):int((y2 - ry1) * scale), int((x1 - rx1) * scale):int((x2 - rx1) * scale)] = 255
+
+        motion = None
+        if self.motion_method == "lk":
+            motion = self._lk_motion(prev_roi, curr_roi, mask)
+        if motion is None:
+            flow = cv2.calcOpticalFlowFarneback(prev_roi, curr_roi, None, 0.5, 3, 15, 3, 5, 1.2, 0)
             mag, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
-            mean_motion = cv2.mean(mag, mask=mask)[0]
-            
-            if mean_motion < self.motion_threshold:
-                is_still = True
-
+            motion = cv2.mean(mag, mask=mask)[0]
+        return motion / scale
+
+    def _lk_motion(self, prev_roi, curr_roi, mask):
+        points = cv2.goodFeaturesToTrack(prev_roi, maxCorners=50, qualityLevel=0.01, minDistance=5, mask=mask)
+        if points is None:
+            return None
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_roi, curr_roi, points, None)
+        ok = status.ravel() == 1
+        if not np.any(ok):
+            return None
+        return float(np.mean(np.linalg.norm((moved - points).reshape(-1, 2)[ok], axis=1)))
+
+    def _update_state(self, is_still, timestamp):
         if is_still:
             if self.still_count == 0: self.start_time = timestamp
-            self.still_count += self.frame_skip
+            self.still_count += 1
         else:
-            duration = self.still_count * (1.0/25.0) * self.frame_skip 
+            duration = self.still_count * self.sample_interval
             if self.still_count > 0:
                 duration = timestamp - self.start_time
             
@@ -307,25 +477,25 @@ class ReporterParadoDetectorV2(VideoDetector):
                     "program": get_current_program()
                 })
             self.still_count = 0
-            
-        self.prev_gray = current_gray
 
 class FocusDetectorV2(VideoDetector):
     def __init__(self):
         super().__init__("Fora de Foco")
+        self.analysis_rate_hz = 25.0
+        self.required_features = ("laplacian_var",)
         self.threshold = 100.0
         self.blur_count = 0
         self.start_time = 0
         self.min_duration = 4.0
 
-    def process_frame(self, full_frame, small_frame, small_gray, timestamp, frame_idx):
-        var = cv2.Laplacian(small_gray, cv2.CV_64F).var()
+    def process_frame(self, frame, timestamp, frame_idx):
+        var = frame.features["laplacian_var"]
         
         if var < self.threshold:
             if self.blur_count == 0: self.start_time = timestamp
             self.blur_count += 1
         else:
-            duration = self.blur_count * 0.04
+            duration = self.blur_count * self.sample_interval
             if duration >= self.min_duration:
                 self.errors.append({
                     "fault_type": "Fora de Foco",
@@ -340,13 +510,15 @@ class FocusDetectorV2(VideoDetector):
 class FadeDetectorV2(VideoDetector):
     def __init__(self):
         super().__init__("Fade")
+        self.analysis_rate_hz = 25.0
+        self.required_features = ("brightness",)
         self.last_brightness = None
         self.fade_seq = 0
         self.direction = 0 
         self.start_time = 0
 
-    def process_frame(self, full_frame, small_frame, small_gray, timestamp, frame_idx):
-        brightness = np.mean(small_gray)
+    def process_frame(self, frame, timestamp, frame_idx):
+        brightness = frame.features["brightness"]
         
         if self.last_brightness is not None:
             diff = brightness - self.last_brightness
@@ -382,62 +554,111 @@ class FadeDetectorV2(VideoDetector):
             })
 
 class ComercialCortadoDetectorV2(VideoDetector):
+    """
+    Os frames 224x224 amostrados vão para um lote pré-alocado; cada lote gera as
+    embeddings em uma única chamada ao MobileNet (guardadas em float16) e a lógica
+    de cortes é reexecutada em ordem sobre as distâncias consecutivas.
+    """
     def __init__(self):
         super().__init__("Comercial Cortado")
-        self.frame_skip = 3
+        self.analysis_rate_hz = 25.0 / 3
+        self.batch_size = MOBILENET_BATCH_SIZE
+        self.batch = np.empty((self.batch_size, 224, 224, 3), dtype=np.uint8)
+        self.embeddings = None
+        self.batch_times = []
+        # Lotes cheios guardados enquanto o MobileNet carrega: [(imagens, tempos)].
+        self.deferred = []
         self.prev_embedding = None
         self.cuts = []
         self.last_fault_end_time = -100.0  
         self.current_fault_index = -1     
 
-    def get_embedding(self, frame):
-        resized = cv2.resize(frame, (224, 224))
-        arr = preprocess_input(np.expand_dims(resized, axis=0))
-        return MOBILENET_MODEL.predict(arr, verbose=0)
+    def get_embeddings(self, images):
+        # Mesma escala do preprocess_input do MobileNetV2 ([-1, 1]), sem importar o TF aqui.
+        arr = images.astype(np.float32) / 127.5 - 1.0
+        with MOBILENET_MODEL.lease() as embed:
+            return embed(arr) if embed is not None else None
 
-    def process_frame(self, full_frame, small_frame, small_gray, timestamp, frame_idx):
-        if MOBILENET_MODEL is None or frame_idx % self.frame_skip != 0:
+    def process_frame(self, frame, timestamp, frame_idx):
+        if not MOBILENET_MODEL.available:
             return
 
-        curr_emb = self.get_embedding(small_frame)
-        
+        self.batch[len(self.batch_times)] = frame.resized(224, 224)
+        self.batch_times.append(timestamp)
+
+        if len(self.batch_times) >= self.batch_size:
+            oldest = self.deferred[0][1][0] if self.deferred else self.batch_times[0]
+            if MOBILENET_MODEL.should_defer(timestamp - oldest):
+                self.deferred.append((self.batch.copy(), self.batch_times))
+                self.batch_times = []
+            else:
+                self._flush()
+
+    def finish(self):
+        self._flush()
+
+    def _flush(self):
+        batches, self.deferred = self.deferred, []
+        n = len(self.batch_times)
+        if n:
+            batches.append((self.batch[:n], self.batch_times))
+        self.batch_times = []
+        for images, times in batches:
+            self._embed_batch(images, times)
+
+    def _embed_batch(self, images, times):
+        n = len(times)
+        emb = self.get_embeddings(images)
+        if emb is None:
+            return
+        if self.embeddings is None:
+            self.embeddings = np.empty((self.batch_size, emb.shape[1]), dtype=np.float16)
+        self.embeddings[:n] = emb
+
+        seq = self.embeddings[:n].astype(np.float32)
         if self.prev_embedding is not None:
-            dist = cosine(self.prev_embedding[0], curr_emb[0])
-            
-            if dist > 0.4: 
-                self.cuts.append(timestamp)
-                
-                if len(self.cuts) >= 2:
-                    start = self.cuts[-2]
-                    end = self.cuts[-1]
-                    duration = end - start
-
-                    if 0.5 <= duration <= 10.0:
-                        if (start - self.last_fault_end_time < 2.0) and (self.current_fault_index != -1):
-                            last_error = self.errors[self.current_fault_index]
-                            new_total_duration = last_error["duration"] + duration
-                            last_error["duration"] = new_total_duration
-                            last_error["description"] = f"Sequência de cortes abruptos detectada (Total: {new_total_duration:.2f}s)."
-                            last_error["level"] = classify_error("Comercial Cortado", new_total_duration)
-                            self.last_fault_end_time = end
-                        else:
-                            self.errors.append({
-                                "fault_type": "Comercial Cortado",
-                                "description": f"Corte abrupto de {duration:.2f}s.",
-                                "duration": duration,
-                                "event_start_time": start,
-                                "level": classify_error("Comercial Cortado", duration),
-                                "program": get_current_program()
-                            })
-                            self.current_fault_index = len(self.errors) - 1
-                            self.last_fault_end_time = end
-        
-        self.prev_embedding = curr_emb
-
-class ArtesSobrepostasDetectorV2(VideoDetector):
+            seq = np.vstack([self.prev_embedding.astype(np.float32), seq])
+        self.prev_embedding = self.embeddings[n - 1].copy()
+
+        norms = np.linalg.norm(seq, axis=1)
+        dists = 1.0 - np.sum(seq[:-1] * seq[1:], axis=1) / np.maximum(norms[:-1] * norms[1:], 1e-12)
+
+        # Sem embedding anterior, a primeira amostra do lote só serve de referência.
+        for dist, timestamp in zip(dists, times[n - len(dists):]):
+            if dist > 0.4:
+                self._register_cut(timestamp)
+
+    def _register_cut(self, timestamp):
+        self.cuts.append(timestamp)
+        
+        if len(self.cuts) >= 2:
+            start = self.cuts[-2]
+            end = self.cuts[-1]
+            duration = end - start
+
+            if 0.5 <= duration <= 10.0:
+                if (start - self.last_fault_end_time < 2.0) and (self.current_fault_index != -1):
+                    last_error = self.errors[self.current_fault_index]
+                    new_total_duration = last_error["duration"] + duration
+                    last_error["duration"] = new_total_duration
+                    last_error["description"] = f"Sequência de cortes abruptos detectada (Total: {new_total_duration:.2f}s)."
+                    last_error["level"] = classify_error("Comercial Cortado", new_total_duration)
+                    self.last_fault_end_time = end
+                else:
+                    self.errors.append({
+                        "fault_type": "Comercial Cortado",
+                        "description": f"Corte abrupto de {duration:.2f}s.",
+                        "duration": duration,
+                        "event_start_time": start,
+                        "level": classify_error("Comercial Cortado", duration),
+                        "program": get_current_program()
+                    })
+                    self.current_fault_index = len(self.errors) - 1
+                    self.last_fault_end_time = end
+
+class ArtesSobrepostasDetectorV2(OcrDetectorV2):
     def __init__(self):
         super().__init__("Artes Sobrepostas")
-        self.frame_skip = 15
         self.fault_count = 0
         self.start_time = 0
 
@@ -448,11 +669,7 @@ class ArtesSobrepostasDetectorV2(VideoDetector):
         y_max = min(max(p[1] for p in box1), max(p[1] for p in box2))
         return x_max > x_min and y_max > y_min
 
-    def process_frame(self, full_frame, small_frame, small_gray, timestamp, frame_idx):
-        if EASYOCR_READER is None or frame_idx % self.frame_skip != 0:
-            return
-
-        results = EASYOCR_READER.readtext(small_frame, detail=1)
+    def process_ocr(self, results, timestamp, width, height):
         found = False
         
         if len(results) > 1:
@@ -468,7 +685,7 @@ class ArtesSobrepostasDetectorV2(VideoDetector):
             if self.fault_count == 0: self.start_time = timestamp
             self.fault_count += 1
         else:
-            duration = self.fault_count * (self.frame_skip / 25.0)
+            duration = self.fault_count * self.sample_interval
             if duration >= 4.0:
                 self.errors.append({
                     "fault_type": "Artes Sobrepostas",
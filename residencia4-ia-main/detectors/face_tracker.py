@@ -0,0 +1,152 @@
+import os
+import cv2
+import torch
+import numpy as np
+import logging
+from core.models import register_model
+from detectors.s3fd import PATH_WEIGHT as S3FD_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+# Recorta o rosto do locutor (S3FD) antes do SyncNet. "auto" liga só se os pesos
+# (sfd_face.pth, fora do repositório) estiverem no lugar; "0" desliga.
+SYNCNET_FACE_TRACK_MODE = os.getenv("SYNCNET_FACE_TRACK", "auto")
+# Detecções por segundo; entre elas a posição do rosto é interpolada.
+FACE_DETECT_RATE_HZ = float(os.getenv("FACE_DETECT_RATE_HZ", 5.0))
+# Largura (px) da imagem entregue ao S3FD.
+FACE_DETECT_WIDTH = int(os.getenv("FACE_DETECT_WIDTH", 320))
+# Frames de detecção enviados juntos ao S3FD (um lote por chamada).
+FACE_DETECT_BATCH = int(os.getenv("FACE_DETECT_BATCH", 4))
+FACE_CONF_THRESHOLD = float(os.getenv("FACE_CONF_THRESHOLD", 0.8))
+# Duas detecções seguidas são o mesmo rosto se a sobreposição (IoU) passar disso.
+FACE_TRACK_MIN_IOU = float(os.getenv("FACE_TRACK_MIN_IOU", 0.5))
+# Margem do recorte, como no pré-processamento original do SyncNet (crop_scale).
+FACE_CROP_SCALE = 0.4
+FACE_CROP_SIZE = (224, 224)
+
+def _face_track_status():
+    if SYNCNET_FACE_TRACK_MODE == "0":
+        return {"active": False, "reason": "desligado (SYNCNET_FACE_TRACK=0)"}
+    if not os.path.exists(S3FD_WEIGHTS):
+        return {"active": False, "reason": f"pesos ausentes: {S3FD_WEIGHTS}"}
+    return {"active": True, "reason": None}
+
+# Estado do rastreio de rosto, decidido uma vez no import e exposto em /ready e /models.
+FACE_TRACK_STATUS = _face_track_status()
+SYNCNET_FACE_TRACK = FACE_TRACK_STATUS["active"]
+if not SYNCNET_FACE_TRACK:
+    logger.warning(f"Rastreio de rosto do lipsync inativo, {FACE_TRACK_STATUS['reason']}: SyncNet avalia o frame inteiro.")
+
+def _load_s3fd():
+    from detectors.s3fd import S3FD
+    return S3FD(device="cuda" if torch.cuda.is_available() else "cpu")
+
+def _warm_s3fd(detector):
+    detector.detect_faces(np.zeros((180, FACE_DETECT_WIDTH, 3), dtype=np.uint8), conf_th=FACE_CONF_THRESHOLD)
+
+# Sem rastreio ativo o S3FD nem é registrado: não entra no warm-up nem no orçamento.
+S3FD_MODEL = register_model("s3fd", _load_s3fd, _warm_s3fd, size_mb=90) if SYNCNET_FACE_TRACK else None
+
+def box_iou(a, b) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def face_crop(frame, box, crop_scale=FACE_CROP_SCALE, size=FACE_CROP_SIZE):
+    """
+    Recorte quadrado centrado no rosto, com margem (mais embaixo, onde fica a boca),
+    no mesmo formato dos vídeos com que o SyncNet foi treinado.
+    """
+    bs = max(box[2] - box[0], box[3] - box[1]) / 2
+    cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+    pad = int(bs * (1 + 2 * crop_scale))
+    padded = cv2.copyMakeBorder(frame, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=(110, 110, 110))
+    my, mx = cy + pad, cx + pad
+    crop = padded[int(my - bs):int(my + bs * (1 + 2 * crop_scale)),
+                  int(mx - bs * (1 + crop_scale)):int(mx + bs * (1 + crop_scale))]
+    return cv2.resize(crop, size)
+
+class FaceTracker:
+    """
+    Rastreio do rosto principal (o maior) para o SyncNet. O S3FD roda a cada
+    `interval` frames; nos frames intermediários a caixa é interpolada entre as
+    duas detecções vizinhas, quando elas são o mesmo rosto. Frames sem rosto
+    saem como None, e o SyncNet não gasta inferência com eles.
+
+    As detecções vão ao S3FD em lotes de `batch` frames; para isso o rastreio
+    segura no máximo `interval * batch` frames.
+    """
+    def __init__(self, detector, frame_rate_hz=25.0, detect_rate_hz=FACE_DETECT_RATE_HZ,
+                 batch=FACE_DETECT_BATCH):
+        self.detector = detector
+        self.interval = max(1, int(round(frame_rate_hz / detect_rate_hz)))
+        self.batch = max(1, batch)
+        self.detections = 0
+        self.faces = 0
+
+    def detect(self, frames):
+        """Caixa (x1, y1, x2, y2) do maior rosto de cada frame BGR, ou None."""
+        scale = min(1.0, FACE_DETECT_WIDTH / float(frames[0].shape[1]))
+        rgb = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+        boxes = []
+        for bboxes in self.detector.detect_faces_batch(rgb, conf_th=FACE_CONF_THRESHOLD, scales=[scale]):
+            self.detections += 1
+            if len(bboxes) == 0:
+                boxes.append(None)
+                continue
+            self.faces += 1
+            areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+            boxes.append(bboxes[int(np.argmax(areas)), :4])
+        return boxes
+
+    def crops(self, frames):
+        """Gera, para cada frame de entrada e na mesma ordem, o recorte 224x224 do rosto ou None."""
+        # held[0] é o último frame de detecção já resolvido (caixa last_box);
+        # to_detect, as posições em held dos frames de detecção ainda sem resultado.
+        held = []
+        to_detect = []
+        last_box = None
+        for idx, frame in enumerate(frames):
+            held.append(frame)
+            if idx % self.interval == 0:
+                to_detect.append(len(held) - 1)
+            if len(to_detect) == self.batch:
+                crops, last_box = self._resolve(held, to_detect, last_box)
+                yield from crops
+                held, to_detect = held[to_detect[-1]:], []
+        if to_detect:
+            crops, last_box = self._resolve(held, to_detect, last_box)
+            yield from crops
+            held = held[to_detect[-1]:]
+        # Após a última detecção não há com quem interpolar: mantém a caixa.
+        for frame in held:
+            yield face_crop(frame, last_box) if last_box is not None else None
+
+    def _resolve(self, held, to_detect, last_box):
+        """
+        Roda o lote de detecções. Retorna os recortes dos frames até o último frame
+        detectado (exclusive) e a caixa desse último frame.
+        """
+        boxes = self.detect([held[p] for p in to_detect])
+        crops = []
+        prev_pos, prev_box = 0, last_box
+        for pos, box in zip(to_detect, boxes):
+            if pos > prev_pos:
+                crops.extend(self._interpolated(held[prev_pos:pos], prev_box, box))
+            prev_pos, prev_box = pos, box
+        return crops, prev_box
+
+    def _interpolated(self, pending, start_box, end_box):
+        # pending[0] é o frame da detecção start_box.
+        yield face_crop(pending[0], start_box) if start_box is not None else None
+        same_face = (start_box is not None and end_box is not None
+                     and box_iou(start_box, end_box) >= FACE_TRACK_MIN_IOU)
+        n = len(pending)
+        for i, frame in enumerate(pending[1:], start=1):
+            if same_face:
+                t = i / float(n)
+                yield face_crop(frame, (1 - t) * start_box + t * end_box)
+            else:
+                yield None
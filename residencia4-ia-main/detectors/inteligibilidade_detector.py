@@ -6,7 +6,8 @@ import torch
 import numpy as np
 import av
 from typing import Optional, Dict, Any
-from transformers import pipeline
+from core.models import register_model
+from core.runtime import model_backend, load_onnx
 from utils.error_classifier import classify_error, get_current_program
 
 logging.basicConfig(level=logging.INFO)
@@ -17,22 +18,43 @@ MODEL_NAME = "jonatasgrosman/wav2vec2-large-xlsr-53-portuguese"
 EXPECTED_SAMPLING_RATE = 16000
 SCHEDULE_FILE_PATH = "../utils/programacao_globo_2025.json"
 
-try:
-    log.info(f"Carregando modelo de STT: {MODEL_NAME}...")
+class OnnxSpeechRecognizer:
+    """
+    Substituto do pipeline de ASR: o processor do transformers extrai as features e
+    decodifica os tokens; os logits CTC do wav2vec2 saem do ONNX Runtime.
+    Decodificação gulosa (argmax), como o pipeline sem modelo de linguagem.
+    """
+    def __init__(self):
+        from transformers import Wav2Vec2Processor
+        self.processor = Wav2Vec2Processor.from_pretrained(MODEL_NAME)
+        self.runner = load_onnx("wav2vec2")
+
+    def __call__(self, inputs):
+        values = self.processor(
+            inputs["raw"], sampling_rate=inputs["sampling_rate"], return_tensors="np"
+        ).input_values.astype(np.float32)
+        logits = self.runner(values)[0]
+        return {"text": self.processor.batch_decode(np.argmax(logits, axis=-1))[0]}
+
+def _load_stt():
+    if model_backend("wav2vec2") == "onnx":
+        stt = OnnxSpeechRecognizer()
+        log.info(f"Modelo STT ({MODEL_NAME}) carregado no ONNX Runtime.")
+        return stt
+    from transformers import pipeline
     device = "cuda:0" if torch.cuda.is_available() else "cpu"
-    
-    stt_pipeline = pipeline(
+    stt = pipeline(
         "automatic-speech-recognition",
         model=MODEL_NAME,
         device=device
     )
-    log.info(f"Modelo STT carregado com sucesso em: {device}")
-except ImportError:
-    log.error("Dependências (transformers, torch) não estão instaladas. Pulando detector de inteligibilidade.")
-    stt_pipeline = None
-except Exception as e:
-    log.error(f"Erro ao carregar modelo STT ({MODEL_NAME}): {e}. O detector de inteligibilidade será desativado.")
-    stt_pipeline = None
+    log.info(f"Modelo STT ({MODEL_NAME}) carregado em: {device}")
+    return stt
+
+def _warm_stt(stt):
+    stt({"sampling_rate": EXPECTED_SAMPLING_RATE, "raw": np.zeros(EXPECTED_SAMPLING_RATE, dtype=np.float32)})
+
+STT_MODEL = register_model("wav2vec2", _load_stt, _warm_stt, size_mb=1400)
 
 def _load_and_process_audio(video_path: str, stream_index: int) -> Optional[np.ndarray]:
     """
@@ -74,6 +96,12 @@ def _load_and_process_audio(video_path: str, stream_index: int) -> Optional[np.n
         log.error(f"Erro PyAV ao carregar áudio (stream {stream_index}): {e}")
         return None
 
+def _get_audio(video_path: str, stream_index: int, media_loader=None) -> Optional[np.ndarray]:
+    """Usa a track já decodificada pelo MediaLoader compartilhado, se houver."""
+    if media_loader is not None:
+        return media_loader.get_audio_track(stream_index)
+    return _load_and_process_audio(video_path, stream_index)
+
 def _calculate_dbfs(audio_data: np.ndarray) -> float:
     if audio_data.size == 0:
         return -float('inf')
@@ -85,13 +113,15 @@ def _calculate_dbfs(audio_data: np.ndarray) -> float:
         
     return 20 * np.log10(rms)
 
-def analyze_inteligibilidade_st(video_path: str) -> Optional[Dict[str, Any]]:
-    if stt_pipeline is None:
+def analyze_inteligibilidade_st(video_path: str, media_loader=None) -> Optional[Dict[str, Any]]:
+    if STT_MODEL.state == "failed":
         return None
         
     log.info(f"Iniciando detecção de ST NÃO INTELIGÍVEL para: {video_path}")
     
-    audio_float = _load_and_process_audio(video_path, 0)
+    audio_float = _get_audio(video_path, 0, media_loader)
+    if media_loader is not None and media_loader.cancelled:
+        return None
     
     if audio_float is None or audio_float.size == 0:
         return None
@@ -105,9 +135,14 @@ def analyze_inteligibilidade_st(video_path: str) -> Optional[Dict[str, Any]]:
 
     try:
         log.info("Inteligibilidade ST: Invocando modelo de IA...")
-        transcription_result = stt_pipeline(
-            {"sampling_rate": EXPECTED_SAMPLING_RATE, "raw": audio_float}
-        )
+        # Carregado só aqui: clipes sem áudio ou muito baixos não precisam do modelo.
+        # Lease: o modelo não é descarregado durante a inferência, que pode ser longa.
+        with STT_MODEL.lease() as stt_pipeline:
+            if stt_pipeline is None:
+                return None
+            transcription_result = stt_pipeline(
+                {"sampling_rate": EXPECTED_SAMPLING_RATE, "raw": audio_float}
+            )
         transcription = transcription_result["text"].strip()
         log.info(f"Inteligibilidade ST: Transcrição: '{transcription}'")
 
@@ -146,13 +181,15 @@ def analyze_inteligibilidade_st(video_path: str) -> Optional[Dict[str, Any]]:
         log.error(f"Erro na inferência STT (ST): {e}")
         return None
 
-def analyze_inteligibilidade_sap_ad(video_path: str) -> Optional[Dict[str, Any]]:
-    if stt_pipeline is None:
+def analyze_inteligibilidade_sap_ad(video_path: str, media_loader=None) -> Optional[Dict[str, Any]]:
+    if STT_MODEL.state == "failed":
         return None
         
     log.info(f"Iniciando detecção de SAP/AD NÃO INTELIGÍVEL para: {video_path}")
     
-    audio_float = _load_and_process_audio(video_path, 1)
+    audio_float = _get_audio(video_path, 1, media_loader)
+    if media_loader is not None and media_loader.cancelled:
+        return None
     
     if audio_float is None or audio_float.size == 0:
         log.info("Inteligibilidade SAP/AD: Stream 1 não encontrado ou vazio.")
@@ -167,9 +204,13 @@ def analyze_inteligibilidade_sap_ad(video_path: str) -> Optional[Dict[str, Any]]
 
     try:
         log.info("Inteligibilidade SAP/AD: Invocando modelo de IA...")
-        transcription_result = stt_pipeline(
-            {"sampling_rate": EXPECTED_SAMPLING_RATE, "raw": audio_float}
-        )
+        # Lease: o modelo não é descarregado durante a inferência, que pode ser longa.
+        with STT_MODEL.lease() as stt_pipeline:
+            if stt_pipeline is None:
+                return None
+            transcription_result = stt_pipeline(
+                {"sampling_rate": EXPECTED_SAMPLING_RATE, "raw": audio_float}
+            )
         transcription = transcription_result["text"].strip()
         log.info(f"Inteligibilidade SAP/AD: Transcrição: '{transcription}'")
 
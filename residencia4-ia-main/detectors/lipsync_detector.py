@@ -3,13 +3,15 @@ import torch.nn as nn
 import numpy as np
 import cv2
 import os
-import math
 import python_speech_features
 import av
 import logging
 import datetime
 import pytz
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from core.models import register_model
+from core.runtime import model_backend, load_onnx
+from detectors.face_tracker import SYNCNET_FACE_TRACK, S3FD_MODEL, FaceTracker
 from utils.error_classifier import classify_error, get_current_program
 
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +19,28 @@ logger = logging.getLogger(__name__)
 
 SYNCNET_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'syncnet_v2.model')
 SCHEDULE_FILE_PATH = "../utils/programacao_globo_2025.json"
+# Tempo máximo (s) sem receber frame do Engine antes de desistir.
+SYNC_FRAMES_TIMEOUT = 600
+# Janela deslizante do SyncNet, em frames de 25 fps: 250 (10 s) cobre um clipe
+# ao vivo inteiro numa janela só; em vídeos longos, sai um offset por janela.
+SYNCNET_WINDOW_FRAMES = int(os.getenv("SYNCNET_WINDOW_FRAMES", 250))
+SYNCNET_WINDOW_HOP = int(os.getenv("SYNCNET_WINDOW_HOP", 125))
+# Sobra final menor que isso não vira janela própria (a não ser que seja a única).
+SYNCNET_MIN_WINDOW_FRAMES = int(os.getenv("SYNCNET_MIN_WINDOW_FRAMES", 50))
+# Fração mínima das posições da janela com rosto para avaliá-la.
+SYNCNET_MIN_FACE_COVERAGE = float(os.getenv("SYNCNET_MIN_FACE_COVERAGE", 0.5))
+SYNC_FPS = 25.0
+# Amostras de áudio (16 kHz) por frame de vídeo a 25 fps: 4 linhas de MFCC de 10 ms.
+SAMPLES_PER_FRAME = 640
+
+_s3fd_warned = False
+
+def _warn_s3fd_unavailable():
+    # O estado "failed" do S3FD é permanente (aparece em /models); avisa só na primeira vez.
+    global _s3fd_warned
+    if not _s3fd_warned:
+        _s3fd_warned = True
+        logger.warning("S3FD indisponível: SyncNet avalia o frame inteiro.")
 
 class S(nn.Module):
     def __init__(self, num_layers_in_fc_layers=1024):
@@ -105,19 +129,195 @@ class S(nn.Module):
         out = self.netfclip(mid)
         return out
 
-def calc_pdist(feat1, feat2, vshift=10):
+def window_pdist(feat1, feat2p, vshift):
+    """
+    Matriz (len(feat1), 2*vshift+1) de distâncias entre cada embedding de vídeo e
+    as embeddings de áudio vizinhas, numa única operação: unfold dá a cada linha
+    a sua janela de áudio como view, sem cópia. `feat2p` já traz vshift linhas de
+    contexto (ou zeros) de cada lado. Mesma conta de pairwise_distance (p=2, eps=1e-6).
+    """
     win_size = vshift * 2 + 1
-    feat2p = torch.nn.functional.pad(feat2, (0, 0, vshift, vshift))
-    dists = []
-    for i in range(0, len(feat1)):
-        dists.append(torch.nn.functional.pairwise_distance(feat1[[i], :].repeat(win_size, 1), feat2p[i:i + win_size, :]))
-    return dists
+    windows = feat2p.unfold(0, win_size, 1)[:len(feat1)].transpose(1, 2)
+    return torch.linalg.vector_norm(feat1.unsqueeze(1) - windows + 1e-6, dim=2)
+
+def mfcc_rows(audio, first, last, preemph=0.97):
+    """
+    Linhas [first, last) do MFCC (passo de 10 ms) do áudio inteiro, calculadas só
+    sobre o trecho necessário. A pré-ênfase é aplicada aqui, com a amostra anterior
+    ao trecho, para o resultado ser idêntico ao do MFCC do sinal completo.
+    Áudio float (a track do MediaLoader) é levado a PCM 16 bits, a escala do
+    SyncNet, também só no trecho: a track inteira não ganha uma segunda cópia.
+    """
+    start, end = first * 160, (last - 1) * 160 + 400
+    seg = audio[max(start - 1, 0):end]
+    if seg.dtype.kind == 'f':
+        seg = np.clip(seg * 32768.0, -32768, 32767).astype(np.int16)
+    seg = seg.astype(np.float64)
+    if start > 0:
+        emph = seg[1:] - preemph * seg[:-1]
+    else:
+        emph = np.append(seg[0], seg[1:] - preemph * seg[:-1])
+    return python_speech_features.mfcc(emph, 16000, preemph=0)[:last - first]
+
+class SyncWindows:
+    """
+    Avaliação do SyncNet em janelas deslizantes sobre uma fonte de frames em
+    streaming. Guarda só os frames do lote em montagem e as embeddings da janela
+    corrente (com vshift de contexto de cada lado); a memória não cresce com a
+    duração do vídeo. Cada janela produz o seu próprio offset e confiança.
+
+    Frames None (sem rosto, vindos do FaceTracker) não passam pelo SyncNet; uma
+    janela com rosto em menos de `min_face_coverage` das posições é pulada
+    (offset e conf None) sem inferência de áudio.
+    """
+    def __init__(self, net, device, opt, audio):
+        self.net = net
+        self.device = device
+        self.batch_size = opt.batch_size
+        self.vshift = opt.vshift
+        self.window = opt.window
+        self.hop = opt.hop
+        self.min_window = opt.min_window
+        self.min_face_coverage = opt.min_face_coverage
+        self.audio = audio
+        # Posições de início (vframe) com áudio suficiente para o bloco de 5 frames.
+        self.audio_frames = len(audio) // SAMPLES_PER_FRAME - 5
+        self.frames = []
+        self.lip = {}
+        self.aud = {}
+        self.lip_count = 0
+        self.aud_count = 0
+        self.window_start = 0
+        self.results = []
+
+    def push(self, frame):
+        self.frames.append(frame)
+        # Um frame a mais que o lote: o último frame do vídeo nunca inicia bloco (como no original).
+        if len(self.frames) >= self.batch_size + 5:
+            self._flush_lip(self.batch_size)
+            self._evaluate_ready(final=False)
+
+    def finish(self):
+        while len(self.frames) > 5 and self.lip_count < self.audio_frames:
+            self._flush_lip(min(self.batch_size, len(self.frames) - 5))
+        self.frames = []
+        self._evaluate_ready(final=True)
+        return self.results
+
+    def _flush_lip(self, n):
+        n = min(n, self.audio_frames - self.lip_count)
+        if n <= 0:
+            self.frames = self.frames[-5:]
+            return
+        head = self.frames[:n + 4]
+        # Só blocos com rosto nos 5 frames vão para o SyncNet.
+        valid = [i for i in range(n) if all(f is not None for f in head[i:i + 5])]
+        if len(valid) == n:
+            blocks = np.lib.stride_tricks.sliding_window_view(np.stack(head), 5, axis=0)[:n]
+        elif valid:
+            blocks = np.stack([np.stack(head[i:i + 5], axis=3) for i in valid])
+        if valid:
+            x = torch.from_numpy(np.ascontiguousarray(blocks.transpose(0, 3, 4, 1, 2), dtype=np.float32))
+            out = self.net.forward_lip(x.to(self.device)).cpu()
+            for k, i in enumerate(valid):
+                self.lip[self.lip_count + i] = out[k]
+        self.lip_count += n
+        del self.frames[:n]
+
+    def _ensure_audio(self, first_needed, upto):
+        # Posições antes de first_needed só serviriam a janelas puladas.
+        self.aud_count = max(self.aud_count, first_needed)
+        while self.aud_count < upto:
+            first = self.aud_count
+            last = min(upto, first + self.batch_size)
+            cc = mfcc_rows(self.audio, first * 4, last * 4 + 16).T
+            blocks = np.stack([cc[:, (v - first) * 4:(v - first) * 4 + 20] for v in range(first, last)])
+            x = torch.from_numpy(blocks[:, np.newaxis].astype(np.float32))
+            out = self.net.forward_aud(x.to(self.device)).cpu()
+            for i, v in enumerate(range(first, last)):
+                self.aud[v] = out[i]
+            self.aud_count = last
+
+    def _evaluate_ready(self, final):
+        while True:
+            start = self.window_start
+            end = start + self.window
+            if final:
+                end = min(end, self.lip_count)
+                if end <= start or (end - start < self.min_window and self.results):
+                    return
+            elif self.lip_count < end + self.vshift:
+                # Ainda sem o contexto à direita (ou sem saber se o vídeo continua).
+                return
+            self._evaluate(start, end)
+            if final and end >= self.lip_count:
+                return
+            self._advance()
+
+    def _evaluate(self, start, end):
+        vs = self.vshift
+        limit = self.lip_count
+        positions = [v for v in range(start, end) if v in self.lip]
+        result = {
+            "start_time": start / SYNC_FPS,
+            "end_time": (end + 4) / SYNC_FPS,
+            "face_coverage": len(positions) / float(end - start),
+        }
+        if not positions or result["face_coverage"] < self.min_face_coverage:
+            self.results.append({**result, "offset": None, "conf": None})
+            return
+        self._ensure_audio(max(start - vs, 0), min(end + vs, limit))
+
+        dim = self.lip[positions[0]].shape[0]
+        im_feat = torch.zeros(end - start, dim)
+        for v in positions:
+            im_feat[v - start] = self.lip[v]
+        context = torch.zeros(end - start + 2 * vs, dim)
+        for j in range(max(start - vs, 0), min(end + vs, limit)):
+            context[j - (start - vs)] = self.aud[j]
+
+        rows = torch.tensor([v - start for v in positions])
+        mdist = torch.mean(window_pdist(im_feat, context, vs)[rows], 0)
+        minval, minidx = torch.min(mdist, 0)
+        self.results.append({
+            **result,
+            "offset": float(vs - minidx),
+            "conf": float(torch.median(mdist) - minval),
+        })
+
+    def _advance(self):
+        old = self.window_start
+        self.window_start += self.hop
+        for v in range(old, self.window_start):
+            self.lip.pop(v, None)
+        for v in range(old - self.vshift, self.window_start - self.vshift):
+            self.aud.pop(v, None)
+
+class OnnxSyncNet:
+    """Mesma interface de S (forward_lip/forward_aud) sobre os grafos exportados para ONNX."""
+    def __init__(self):
+        self.lip = load_onnx("syncnet_lip", quantize_key="syncnet")
+        self.aud = load_onnx("syncnet_aud", quantize_key="syncnet")
+
+    def eval(self):
+        return self
+
+    def forward_lip(self, x):
+        return torch.from_numpy(self.lip(x.cpu().numpy())[0])
+
+    def forward_aud(self, x):
+        return torch.from_numpy(self.aud(x.cpu().numpy())[0])
 
 class SyncNetInstance(torch.nn.Module):
-    def __init__(self, dropout=0, num_layers_in_fc_layers=1024):
+    def __init__(self, dropout=0, num_layers_in_fc_layers=1024, net=None):
         super(SyncNetInstance, self).__init__()
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.__S__ = S(num_layers_in_fc_layers=num_layers_in_fc_layers).to(self.device)
+        if net is not None:
+            # Rede externa (ONNX Runtime): as entradas ficam na CPU, como o runtime espera.
+            self.device = torch.device("cpu")
+            self.__S__ = net
+        else:
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            self.__S__ = S(num_layers_in_fc_layers=num_layers_in_fc_layers).to(self.device)
 
     def _extract_audio_memory(self, videofile, target_sr=16000):
         try:
@@ -152,77 +352,83 @@ class SyncNetInstance(torch.nn.Module):
             logger.error(f"Erro PyAV na extração de áudio: {e}")
             return None
 
-    def evaluate(self, opt, videofile):
-        self.__S__.eval()
-        
-        images = []
+    def _iter_frames(self, videofile, small=False):
+        """224x224, ou na largura de análise do Engine (640) para o rastreio de rosto."""
+        cap = cv2.VideoCapture(videofile)
         try:
-            cap = cv2.VideoCapture(videofile)
             while True:
                 ret, frame = cap.read()
                 if not ret:
                     break
-                images.append(cv2.resize(frame, (224, 224)))
+                if small:
+                    h, w = frame.shape[:2]
+                    yield cv2.resize(frame, (640, max(1, int(round(h * 640.0 / w)))))
+                else:
+                    yield cv2.resize(frame, (224, 224))
+        finally:
             cap.release()
-        except Exception as e:
-            logger.error(f"Erro ao ler frames com OpenCV: {e}")
-            return None, None
 
-        if not images:
-            logger.warning("Nenhuma imagem extraída do vídeo.")
-            return None, None
+    def evaluate(self, opt, videofile, media_loader=None) -> Optional[List[Dict[str, float]]]:
+        """
+        Avalia a sincronia em janelas deslizantes (SyncWindows) e retorna
+        [{start_time, end_time, face_coverage, offset, conf}, ...], ou None se não
+        há o que avaliar. Com rastreio de rosto, o SyncNet recebe só o recorte do
+        rosto do locutor; janelas sem rosto saem com offset e conf None.
+        Com um MediaLoader compartilhado, consome os frames à medida que o Engine os
+        publica e usa a track de áudio já decodificada, sem reabrir o arquivo.
+        """
+        self.__S__.eval()
+
+        if media_loader is not None:
+            audio = media_loader.get_audio_track(0)
+        else:
+            audio = self._extract_audio_memory(videofile, target_sr=16000)
+
+        if audio is None or len(audio) < SAMPLES_PER_FRAME * 6:
+            logger.warning("Áudio muito curto ou inexistente para análise.")
+            return None
 
-        audio = self._extract_audio_memory(videofile, target_sr=16000)
-        
-        if audio is None or len(audio) < 640:
-             logger.warning("Áudio muito curto ou inexistente para análise.")
-             return None, None
+        if media_loader is not None:
+            face_track = media_loader.sync_face_track
+            frames = media_loader.iter_sync_frames(timeout=SYNC_FRAMES_TIMEOUT)
+        else:
+            face_track = opt.face_track
+            frames = self._iter_frames(videofile, small=face_track)
+
+        if face_track:
+            # Lease: o S3FD não é descarregado enquanto o rastreio o usa.
+            with S3FD_MODEL.lease() as detector:
+                return self._evaluate_frames(opt, audio, frames, media_loader, True, detector)
+        return self._evaluate_frames(opt, audio, frames, media_loader, False)
+
+    def _evaluate_frames(self, opt, audio, frames, media_loader, face_track, detector=None):
+        tracker = None
+        if face_track:
+            if detector is not None:
+                tracker = FaceTracker(detector)
+                frames = tracker.crops(frames)
+            else:
+                _warn_s3fd_unavailable()
+                frames = (cv2.resize(frame, (224, 224)) for frame in frames)
 
         try:
-            im = np.stack(images, axis=3)
-            im = np.expand_dims(im, axis=0)
-            im = np.transpose(im, (0, 3, 4, 1, 2))
-            imtv = torch.autograd.Variable(torch.from_numpy(im.astype(float)).float()).to(self.device)
-
-            mfcc = zip(*python_speech_features.mfcc(audio, 16000))
-            mfcc = np.stack([np.array(i) for i in mfcc])
-            cc = np.expand_dims(np.expand_dims(mfcc, axis=0), axis=0)
-            cct = torch.autograd.Variable(torch.from_numpy(cc.astype(float)).float()).to(self.device)
-
-            min_length = min(len(images), math.floor(len(audio) / 640))
-            lastframe = min_length - 5
-            im_feat, cc_feat = [], []
-
-            for i in range(0, lastframe, opt.batch_size):
-                im_batch = [imtv[:, :, vframe:vframe + 5, :, :] for vframe in range(i, min(lastframe, i + opt.batch_size))]
-                if not im_batch: 
-                    break
-                im_in = torch.cat(im_batch, 0)
-                im_out = self.__S__.forward_lip(im_in)
-                im_feat.append(im_out.data.cpu()) 
-                
-                cc_batch = [cct[:, :, :, vframe * 4:vframe * 4 + 20] for vframe in range(i, min(lastframe, i + opt.batch_size))]
-                cc_in = torch.cat(cc_batch, 0)
-                cc_out = self.__S__.forward_aud(cc_in)
-                cc_feat.append(cc_out.data.cpu())
-
-            if not im_feat or not cc_feat:
-                return None, None
-
-            im_feat = torch.cat(im_feat, 0)
-            cc_feat = torch.cat(cc_feat, 0)
-            dists = calc_pdist(im_feat, cc_feat, vshift=opt.vshift)
-            mdist = torch.mean(torch.stack(dists, 1), 1)
-            
-            minval, minidx = torch.min(mdist, 0)
-            offset = opt.vshift - minidx
-            conf = torch.median(mdist) - minval
-            
-            return offset.numpy(), conf.numpy()
-            
+            windows = SyncWindows(self.__S__, self.device, opt, audio)
+            with torch.no_grad():
+                for frame in frames:
+                    if media_loader is not None and media_loader.cancelled:
+                        return None
+                    windows.push(frame)
+                results = windows.finish()
         except Exception as e:
             logger.error(f"Erro durante a avaliação SyncNet: {e}")
-            return None, None
+            return None
+
+        if tracker is not None:
+            logger.info(f"Rastreio de rosto: {tracker.faces}/{tracker.detections} detecções com rosto.")
+        if not results:
+            logger.warning("Nenhuma janela de frames suficiente para o SyncNet.")
+            return None
+        return results
 
     def loadParameters(self, path):
         loaded_state = torch.load(path, map_location=self.device)
@@ -239,18 +445,31 @@ class SyncNetOptions:
         self.reference = 'analysis'
         self.batch_size = 20
         self.vshift = 15
-
-syncnet_model = None
-try:
-    if os.path.exists(SYNCNET_MODEL_PATH):
-        syncnet_model = SyncNetInstance()
-        syncnet_model.loadParameters(SYNCNET_MODEL_PATH)
-        logger.info(f"Modelo SyncNet carregado com sucesso (Device: {syncnet_model.device}).")
-    else:
-        logger.warning(f"AVISO: Modelo SyncNet não encontrado em '{SYNCNET_MODEL_PATH}'.")
-except Exception as e:
-    syncnet_model = None
-    logger.error(f"ERRO ao carregar o modelo SyncNet: {e}")
+        self.window = SYNCNET_WINDOW_FRAMES
+        self.hop = SYNCNET_WINDOW_HOP
+        self.min_window = SYNCNET_MIN_WINDOW_FRAMES
+        self.min_face_coverage = SYNCNET_MIN_FACE_COVERAGE
+        self.face_track = SYNCNET_FACE_TRACK
+
+def _load_syncnet():
+    if model_backend("syncnet") == "onnx":
+        model = SyncNetInstance(net=OnnxSyncNet())
+        logger.info("Modelo SyncNet carregado (ONNX Runtime).")
+        return model
+    if not os.path.exists(SYNCNET_MODEL_PATH):
+        raise FileNotFoundError(f"Modelo SyncNet não encontrado em '{SYNCNET_MODEL_PATH}'.")
+    model = SyncNetInstance()
+    model.loadParameters(SYNCNET_MODEL_PATH)
+    model.__S__.eval()
+    logger.info(f"Modelo SyncNet carregado (Device: {model.device}).")
+    return model
+
+def _warm_syncnet(model):
+    with torch.no_grad():
+        model.__S__.forward_lip(torch.zeros(1, 3, 5, 224, 224, device=model.device))
+        model.__S__.forward_aud(torch.zeros(1, 1, 13, 20, device=model.device))
+
+SYNCNET_MODEL = register_model("syncnet", _load_syncnet, _warm_syncnet, size_mb=100)
 
 def get_video_duration(video_path):
     try:
@@ -269,56 +488,101 @@ def get_video_duration(video_path):
         except:
             return 5.0
 
-def analyze_lipsync(video_path: str) -> Optional[Dict[str, Any]]:
-    if not syncnet_model:
-        logger.warning("Aviso: Detecção de lipsync desativada (modelo não carregado).")
-        return None
-
-    logger.info(f"Iniciando a detecção de lipsync com SyncNet para o vídeo: {video_path}")
-    
+def _is_lipsync_fault(window) -> bool:
+    if window["offset"] is None:
+        return False
+    return abs(window["offset"]) > 4 and window["conf"] > 3.0
+
+def merge_fault_windows(windows):
+    """Agrupa janelas com dessincronia consecutivas (elas se sobrepõem) em eventos."""
+    events = []
+    current = None
+    for window in windows:
+        if not _is_lipsync_fault(window):
+            current = None
+            continue
+        if current is None:
+            current = {"start_time": window["start_time"], "end_time": window["end_time"], "windows": []}
+            events.append(current)
+        current["end_time"] = window["end_time"]
+        current["windows"].append(window)
+    return events
+
+def analyze_lipsync(video_path: str, media_loader=None) -> Optional[List[Dict[str, Any]]]:
     try:
-        opt = SyncNetOptions()
-        result = syncnet_model.evaluate(opt, video_path)
-        
-        if not result or result[0] is None:
+        with SYNCNET_MODEL.lease() as syncnet_model:
+            if not syncnet_model:
+                logger.warning("Aviso: Detecção de lipsync desativada (modelo não carregado).")
+                return None
+
+            logger.info(f"Iniciando a detecção de lipsync com SyncNet para o vídeo: {video_path}")
+
+            opt = SyncNetOptions()
+            windows = syncnet_model.evaluate(opt, video_path, media_loader=media_loader)
+
+        if not windows:
             logger.info("INFO: Não foi possível calcular lipsync (vídeo curto ou sem áudio).")
             return None
-            
-        offset, conf = result
-        offset_val = float(offset)
-        conf_val = float(conf)
 
-        logger.info(f"DEBUG: Offset detectado: {offset_val} | Confiança: {conf_val}")
+        for window in windows:
+            if window["offset"] is None:
+                logger.info(
+                    f"DEBUG: Janela {window['start_time']:.1f}-{window['end_time']:.1f}s pulada "
+                    f"(rosto em {window['face_coverage']:.0%} dos frames)."
+                )
+                continue
+            logger.info(
+                f"DEBUG: Janela {window['start_time']:.1f}-{window['end_time']:.1f}s | "
+                f"Offset: {window['offset']} | Confiança: {window['conf']:.2f}"
+            )
+
+        events = merge_fault_windows(windows)
+        if not events:
+            logger.info("INFO: Sincronia de áudio e vídeo considerada aceitável.")
+            return None
 
-        if abs(offset_val) > 4 and conf_val > 3.0:
+        if media_loader is not None and media_loader.metadata.get("duration"):
+            clip_duration = media_loader.metadata["duration"]
+        else:
             clip_duration = get_video_duration(video_path)
-            tz = pytz.timezone('America/Sao_Paulo')
-            event_start_datetime = datetime.datetime.now(tz) - datetime.timedelta(seconds=clip_duration)
+        tz = pytz.timezone('America/Sao_Paulo')
+        clip_start_datetime = datetime.datetime.now(tz) - datetime.timedelta(seconds=clip_duration)
+
+        faults = []
+        for event in events:
+            worst = max(event["windows"], key=lambda w: w["conf"])
+            offset_val, conf_val = worst["offset"], worst["conf"]
+            event_duration = event["end_time"] - event["start_time"]
+            event_start_datetime = clip_start_datetime + datetime.timedelta(seconds=event["start_time"])
 
             program_name = get_current_program(
                 target_datetime=event_start_datetime, 
                 schedule_file_path=SCHEDULE_FILE_PATH
             )
 
-            logger.warning(f"LIPSYNC: Dessincronia detectada (Offset: {offset_val}, Conf: {conf_val}). Programa: {program_name}")
-            
-            fault_data = {
+            logger.warning(
+                f"LIPSYNC: Dessincronia detectada em {event['start_time']:.1f}-{event['end_time']:.1f}s "
+                f"(Offset: {offset_val}, Conf: {conf_val}). Programa: {program_name}"
+            )
+
+            faults.append({
                 "program": program_name, 
-                "duration": clip_duration,
-                "level": classify_error("Lipsync", clip_duration),
+                "duration": event_duration,
+                "level": classify_error("Lipsync", event_duration),
                 "fault_type": "Erro de LipSync",
                 "description": "Dessincronia de áudio e vídeo detectada por IA.",
                 "cause": "Análise de SyncNet",
                 "action": "Não se aplica",
                 "notes": f"Detecção de Lipsync com offset de {offset_val:.2f} frames e confiança de {conf_val:.2f}. Início Real Estimado: {event_start_datetime.strftime('%Y-%m-%d %H:%M:%S %Z%z')}",
-                "event_start_time": 0.0, 
-                "event_duration": clip_duration
-            }
-            return fault_data
-        else:
-            logger.info("INFO: Sincronia de áudio e vídeo considerada aceitável.")
-            return None
-        
+                "event_start_time": event["start_time"], 
+                "event_duration": event_duration
+            })
+        return faults
+
     except Exception as e:
         logger.error(f"ERRO na execução do SyncNet para o vídeo '{video_path}': {e}")
-        return None
\ No newline at end of file
+        return None
+    finally:
+        # Libera o frame loop do Engine, que pode estar esperando vaga na fila.
+        if media_loader is not None:
+            media_loader.close_sync_frames()
@@ -0,0 +1,125 @@
+import os
+import glob
+import threading
+import cv2
+import numpy as np
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+LOGO_LIBRARY_DIR = os.path.join("models", "templates", "logos")
+
+# Índice LSH do FLANN para descritores binários (ORB).
+FLANN_INDEX_LSH = 6
+
+def template_mask(template):
+    """Máscara dos pixels claros do logo; usa o template inteiro se não houver nenhum."""
+    gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+    _, mask = cv2.threshold(gray, 210, 255, cv2.THRESH_BINARY)
+    if cv2.countNonZero(mask) == 0:
+        mask = np.full_like(gray, 255)
+    return mask
+
+def build_template_pyramid(template, mask, scales):
+    """Pré-calcula [(template, máscara)] redimensionados para cada escala."""
+    t_h, t_w = template.shape[:2]
+    pyramid = []
+    for scale in scales:
+        tw, th = int(t_w * scale), int(t_h * scale)
+        if tw == 0 or th == 0:
+            continue
+        pyramid.append((
+            cv2.resize(template, (tw, th), interpolation=cv2.INTER_AREA),
+            cv2.resize(mask, (tw, th), interpolation=cv2.INTER_AREA),
+        ))
+    return pyramid
+
+class LogoLibrary:
+    """
+    Biblioteca de logos válidos (emissora, afiliadas, marcas de programa).
+    Os descritores ORB de cada template são calculados uma vez e indexados num
+    único índice FLANN-LSH: uma passada por frame amostrado vota em qual logo,
+    se algum, está presente, e o candidato é confirmado por homografia (RANSAC).
+    """
+    def __init__(self, templates, scales, min_matches=8, ratio=0.75):
+        self.scales = scales
+        self.min_matches = min_matches
+        self.ratio = ratio
+        self.orb = cv2.ORB_create(nfeatures=500, edgeThreshold=15, patchSize=15)
+        self.matcher = cv2.FlannBasedMatcher(
+            dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1),
+            dict(checks=50)
+        )
+        self.names = []
+        # Logos sem keypoints suficientes para o índice: só a varredura por template os acha.
+        self.unindexed = []
+        self.keypoints = []
+        self.pyramids = {}
+        # A biblioteca é compartilhada entre requisições; o matcher não é thread-safe.
+        self._lock = threading.Lock()
+
+        descriptors = []
+        for name, template in templates:
+            mask = template_mask(template)
+            self.pyramids[name] = build_template_pyramid(template, mask, scales)
+            kps, desc = self.orb.detectAndCompute(cv2.cvtColor(template, cv2.COLOR_BGR2GRAY), mask)
+            if desc is None or len(kps) < self.min_matches:
+                logger.warning(f"Logo '{name}' com poucos keypoints; só será usado por template matching.")
+                self.unindexed.append(name)
+                continue
+            self.names.append(name)
+            self.keypoints.append(kps)
+            descriptors.append(desc)
+
+        if descriptors:
+            self.matcher.add(descriptors)
+            self.matcher.train()
+        logger.info(f"Biblioteca de logos: {len(self.pyramids)} templates, {len(self.names)} indexados.")
+
+    @classmethod
+    def from_paths(cls, paths, scales, **kwargs):
+        templates = []
+        for path in paths:
+            img = cv2.imread(path)
+            if img is None:
+                logger.error(f"Não foi possível ler template em {path}")
+                continue
+            templates.append((os.path.splitext(os.path.basename(path))[0], img))
+        return cls(templates, scales, **kwargs)
+
+    @classmethod
+    def from_directory(cls, primary_path, scales, directory=LOGO_LIBRARY_DIR, **kwargs):
+        """Template principal + todos os PNG de `directory` (se existir)."""
+        paths = [primary_path] if os.path.exists(primary_path) else []
+        paths += sorted(glob.glob(os.path.join(directory, "*.png")))
+        return cls.from_paths(paths, scales, **kwargs)
+
+    def __len__(self):
+        return len(self.pyramids)
+
+    def identify(self, roi) -> Optional[str]:
+        """Retorna o nome do logo presente no recorte, ou None."""
+        if not self.names:
+            return None
+        kps, desc = self.orb.detectAndCompute(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), None)
+        if desc is None or len(kps) < self.min_matches:
+            return None
+
+        with self._lock:
+            pairs = self.matcher.knnMatch(desc, k=2)
+
+        votes = {}
+        for pair in pairs:
+            if len(pair) == 2 and pair[0].distance < self.ratio * pair[1].distance:
+                votes.setdefault(pair[0].imgIdx, []).append(pair[0])
+
+        for idx, good in sorted(votes.items(), key=lambda item: -len(item[1])):
+            if len(good) < self.min_matches:
+                break
+            src = np.float32([self.keypoints[idx][m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+            dst = np.float32([kps[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
+            _, inliers = cv2.findHomography(src, dst, cv2.RANSAC, 5.0)
+            if inliers is not None and int(inliers.sum()) >= self.min_matches:
+                return self.names[idx]
+        return None
@@ -2,12 +2,12 @@ import time
 import numpy as np
 import cv2
 import torch
-from torchvision import transforms
 from .nets import S3FDNet
 from .box_utils import nms_
 
 PATH_WEIGHT = './detectors/s3fd/weights/sfd_face.pth'
-img_mean = np.array([104., 117., 123.])[:, np.newaxis, np.newaxis].astype('float32')
+# Média BGR do treino (104, 117, 123) na ordem RGB da entrada.
+img_mean = torch.tensor([123., 117., 104.]).view(1, 3, 1, 1)
 
 
 class S3FD():
@@ -22,40 +22,45 @@ class S3FD():
         state_dict = torch.load(PATH_WEIGHT, map_location=self.device)
         self.net.load_state_dict(state_dict)
         self.net.eval()
+        self.mean = img_mean.to(self.device)
         print('[S3FD] finished loading (%.4f sec)' % (time.time() - tstamp))
     
     def detect_faces(self, image, conf_th=0.8, scales=[1]):
+        return self.detect_faces_batch([image], conf_th=conf_th, scales=scales)[0]
 
-        w, h = image.shape[1], image.shape[0]
+    def detect_faces_batch(self, images, conf_th=0.8, scales=[1]):
+        """
+        Detecta rostos em várias imagens RGB numa única passada da rede por escala
+        (imagens de mesmo tamanho vão no mesmo lote). Retorna, para cada imagem, um
+        array (N, 5) com [x1, y1, x2, y2, score] em pixels da imagem original.
+        """
+        groups = {}
+        for i, image in enumerate(images):
+            groups.setdefault(image.shape, []).append(i)
 
-        bboxes = np.empty(shape=(0, 5))
+        parts = [[] for _ in images]
 
         with torch.no_grad():
-            for s in scales:
-                scaled_img = cv2.resize(image, dsize=(0, 0), fx=s, fy=s, interpolation=cv2.INTER_LINEAR)
-
-                scaled_img = np.swapaxes(scaled_img, 1, 2)
-                scaled_img = np.swapaxes(scaled_img, 1, 0)
-                scaled_img = scaled_img[[2, 1, 0], :, :]
-                scaled_img = scaled_img.astype('float32')
-                scaled_img -= img_mean
-                scaled_img = scaled_img[[2, 1, 0], :, :]
-                x = torch.from_numpy(scaled_img).unsqueeze(0).to(self.device)
-                y = self.net(x)
-
-                detections = y.data
+            for shape, idxs in groups.items():
+                h, w = shape[0], shape[1]
                 scale = torch.Tensor([w, h, w, h])
+                for s in scales:
+                    batch = np.stack([
+                        cv2.resize(images[i], dsize=(0, 0), fx=s, fy=s, interpolation=cv2.INTER_LINEAR)
+                        for i in idxs
+                    ])
+                    x = torch.from_numpy(batch).to(self.device).permute(0, 3, 1, 2).float() - self.mean
+                    # Só a classe rosto; as linhas vêm ordenadas por score e zeradas no fim.
+                    detections = self.net(x)[:, 1].cpu()
 
-                for i in range(detections.size(1)):
-                    j = 0
-                    while detections[0, i, j, 0] > conf_th:
-                        score = detections[0, i, j, 0]
-                        pt = (detections[0, i, j, 1:] * scale).cpu().numpy()
-                        bbox = (pt[0], pt[1], pt[2], pt[3], score)
-                        bboxes = np.vstack((bboxes, bbox))
-                        j += 1
+                    for k, i in enumerate(idxs):
+                        det = detections[k]
+                        det = det[det[:, 0] > conf_th]
+                        parts[i].append(torch.cat((det[:, 1:] * scale, det[:, :1]), 1).numpy())
 
+        results = []
+        for image_parts in parts:
+            bboxes = np.concatenate(image_parts).astype(np.float64) if image_parts else np.empty(shape=(0, 5))
             keep = nms_(bboxes, 0.1)
-            bboxes = bboxes[keep]
-
-        return bboxes
+            results.append(bboxes[keep])
+        return results
@@ -1,41 +1,19 @@
 import numpy as np
-from itertools import product as product
 import torch
+import torchvision
 from torch.autograd import Function
 
 
 def nms_(dets, thresh):
     """
-    Courtesy of Ross Girshick
-    [https://github.com/rbgirshick/py-faster-rcnn/blob/master/lib/nms/py_cpu_nms.py]
+    NMS guloso de py-faster-rcnn (Ross Girshick) sobre linhas [x1, y1, x2, y2, score],
+    com o kernel de torchvision.ops.nms. Retorna os índices mantidos, por score decrescente.
     """
-    x1 = dets[:, 0]
-    y1 = dets[:, 1]
-    x2 = dets[:, 2]
-    y2 = dets[:, 3]
-    scores = dets[:, 4]
-
-    areas = (x2 - x1) * (y2 - y1)
-    order = scores.argsort()[::-1]
-
-    keep = []
-    while order.size > 0:
-        i = order[0]
-        keep.append(int(i))
-        xx1 = np.maximum(x1[i], x1[order[1:]])
-        yy1 = np.maximum(y1[i], y1[order[1:]])
-        xx2 = np.minimum(x2[i], x2[order[1:]])
-        yy2 = np.minimum(y2[i], y2[order[1:]])
-
-        w = np.maximum(0.0, xx2 - xx1)
-        h = np.maximum(0.0, yy2 - yy1)
-        inter = w * h
-        ovr = inter / (areas[i] + areas[order[1:]] - inter)
-
-        inds = np.where(ovr <= thresh)[0]
-        order = order[inds + 1]
-
-    return np.array(keep).astype(np.int)
+    if len(dets) == 0:
+        return np.empty(0, dtype=np.int64)
+    boxes = torch.from_numpy(np.ascontiguousarray(dets[:, :4], dtype=np.float32))
+    scores = torch.from_numpy(np.ascontiguousarray(dets[:, 4], dtype=np.float32))
+    return torchvision.ops.nms(boxes, scores, thresh).numpy().astype(np.int64)
 
 
 def decode(loc, priors, variances):
@@ -74,55 +52,11 @@ def nms(boxes, scores, overlap=0.5, top_k=200):
     keep = scores.new(scores.size(0)).zero_().long()
     if boxes.numel() == 0:
         return keep, 0
-    x1 = boxes[:, 0]
-    y1 = boxes[:, 1]
-    x2 = boxes[:, 2]
-    y2 = boxes[:, 3]
-    area = torch.mul(x2 - x1, y2 - y1)
-    v, idx = scores.sort(0)  # sort in ascending order
-    # I = I[v >= 0.01]
-    idx = idx[-top_k:]  # indices of the top-k largest vals
-    xx1 = boxes.new()
-    yy1 = boxes.new()
-    xx2 = boxes.new()
-    yy2 = boxes.new()
-    w = boxes.new()
-    h = boxes.new()
-
-    # keep = torch.Tensor()
-    count = 0
-    while idx.numel() > 0:
-        i = idx[-1]  # index of current largest val
-        # keep.append(i)
-        keep[count] = i
-        count += 1
-        if idx.size(0) == 1:
-            break
-        idx = idx[:-1]  # remove kept element from view
-        # load bboxes of next highest vals
-        torch.index_select(x1, 0, idx, out=xx1)
-        torch.index_select(y1, 0, idx, out=yy1)
-        torch.index_select(x2, 0, idx, out=xx2)
-        torch.index_select(y2, 0, idx, out=yy2)
-        # store element-wise max with next highest score
-        xx1 = torch.clamp(xx1, min=x1[i])
-        yy1 = torch.clamp(yy1, min=y1[i])
-        xx2 = torch.clamp(xx2, max=x2[i])
-        yy2 = torch.clamp(yy2, max=y2[i])
-        w.resize_as_(xx2)
-        h.resize_as_(yy2)
-        w = xx2 - xx1
-        h = yy2 - yy1
-        # check sizes of xx1 and xx2.. after each iteration
-        w = torch.clamp(w, min=0.0)
-        h = torch.clamp(h, min=0.0)
-        inter = w * h
-        # IoU = i / (area(a) + area(b) - i)
-        rem_areas = torch.index_select(area, 0, idx)  # load remaining areas)
-        union = (rem_areas - inter) + area[i]
-        IoU = inter / union  # store result in iou
-        # keep only elements with an IoU <= overlap
-        idx = idx[IoU.le(overlap)]
+    # Mesmo critério do laço original (mantém IoU <= overlap), num único kernel.
+    idx = scores.argsort(descending=True)[:top_k]
+    kept = torchvision.ops.nms(boxes[idx], scores[idx], overlap)
+    count = kept.numel()
+    keep[:count] = idx[kept]
     return keep, count
 
 
@@ -151,20 +85,19 @@ class Detect(object):
         decoded_boxes = decode(loc_data.view(-1, 4), batch_priors, self.variance)
         decoded_boxes = decoded_boxes.view(num, num_priors, 4)
 
-        output = torch.zeros(num, self.num_classes, self.top_k, 5)
+        output = loc_data.new_zeros(num, self.num_classes, self.top_k, 5)
 
         for i in range(num):
-            boxes = decoded_boxes[i].clone()
-            conf_scores = conf_preds[i].clone()
+            boxes = decoded_boxes[i]
+            conf_scores = conf_preds[i]
 
             for cl in range(1, self.num_classes):
                 c_mask = conf_scores[cl].gt(self.conf_thresh)
                 scores = conf_scores[cl][c_mask]
                 
-                if scores.dim() == 0:
+                if scores.numel() == 0:
                     continue
-                l_mask = c_mask.unsqueeze(1).expand_as(boxes)
-                boxes_ = boxes[l_mask].view(-1, 4)
+                boxes_ = boxes[c_mask]
                 ids, count = nms(boxes_, scores, self.nms_thresh, self.nms_top_k)
                 count = count if count < self.top_k else self.top_k
 
@@ -193,23 +126,23 @@ class PriorBox(object):
         self.clip = clip
 
     def forward(self):
+        # Mesma ordem do laço original por célula (linha externa, coluna interna), vetorizada.
         mean = []
         for k, fmap in enumerate(self.feature_maps):
             feath = fmap[0]
             featw = fmap[1]
-            for i, j in product(range(feath), range(featw)):
-                f_kw = self.imw / self.steps[k]
-                f_kh = self.imh / self.steps[k]
+            f_kw = self.imw / self.steps[k]
+            f_kh = self.imh / self.steps[k]
 
-                cx = (j + 0.5) / f_kw
-                cy = (i + 0.5) / f_kh
+            cx = ((torch.arange(featw, dtype=torch.float64) + 0.5) / f_kw).repeat(feath)
+            cy = ((torch.arange(feath, dtype=torch.float64) + 0.5) / f_kh).repeat_interleave(featw)
 
-                s_kw = self.min_sizes[k] / self.imw
-                s_kh = self.min_sizes[k] / self.imh
+            s_kw = torch.full_like(cx, self.min_sizes[k] / self.imw)
+            s_kh = torch.full_like(cx, self.min_sizes[k] / self.imh)
 
-                mean += [cx, cy, s_kw, s_kh]
+            mean.append(torch.stack((cx, cy, s_kw, s_kh), 1))
 
-        output = torch.FloatTensor(mean).view(-1, 4)
+        output = torch.cat(mean, 0).float()
         
         if self.clip:
             output.clamp_(max=1, min=0)
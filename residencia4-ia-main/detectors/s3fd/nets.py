@@ -105,6 +105,17 @@ class S3FDNet(nn.Module):
 
         self.softmax = nn.Softmax(dim=-1)
         self.detect = Detect()
+        # Priors dependem só do tamanho da entrada: calculados uma vez por tamanho.
+        self._priors = {}
+
+    def get_priors(self, size, features_maps):
+        key = tuple(size)
+        priors = self._priors.get(key)
+        if priors is None:
+            with torch.no_grad():
+                priors = PriorBox(size, features_maps).forward().to(self.device)
+            self._priors[key] = priors
+        return priors
 
     def forward(self, x):
         size = x.size()[2:]
@@ -161,14 +172,12 @@ class S3FDNet(nn.Module):
         loc = torch.cat([o.view(o.size(0), -1) for o in loc], 1)
         conf = torch.cat([o.view(o.size(0), -1) for o in conf], 1)
 
-        with torch.no_grad():
-            self.priorbox = PriorBox(size, features_maps)
-            self.priors = self.priorbox.forward()
+        self.priors = self.get_priors(size, features_maps)
 
         output = self.detect.forward(
             loc.view(loc.size(0), -1, 4),
             self.softmax(conf.view(conf.size(0), -1, 2)),
-            self.priors.type(type(x.data)).to(self.device)
+            self.priors
         )
 
         return output
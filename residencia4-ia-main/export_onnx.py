@@ -0,0 +1,102 @@
+"""
+Exporta os modelos da IA para ONNX (models/onnx), para rodar com INFERENCE_BACKEND=onnx.
+
+    python export_onnx.py                # todos
+    python export_onnx.py yolo syncnet   # só alguns
+
+Dependências extras, só para exportar: onnx e tf2onnx (MobileNetV2).
+A versão int8 de cada grafo é gerada pelo próprio serviço na primeira carga
+(ONNX_INT8_MODELS), não aqui.
+
+O S3FD (rastreio de rosto do lipsync) fica no PyTorch: o forward dele inclui a
+decodificação e o NMS por imagem, que não têm export direto para ONNX.
+"""
+import os
+import sys
+import shutil
+import logging
+import numpy as np
+import torch
+
+from core.runtime import ONNX_MODEL_DIR
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OPSET = 17
+
+def _target(name):
+    os.makedirs(ONNX_MODEL_DIR, exist_ok=True)
+    return os.path.join(ONNX_MODEL_DIR, f"{name}.onnx")
+
+def export_mobilenet():
+    import tensorflow as tf
+    import tf2onnx
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+    model = MobileNetV2(weights='imagenet', include_top=False, pooling='avg')
+    spec = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name="images"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=OPSET, output_path=_target("mobilenet"))
+
+def export_yolo():
+    from ultralytics import YOLO
+    from detectors.detectors_v2 import YOLO_IMGSZ
+    # dynamic=True: aceita os lotes de tamanho variável do Repórter Parado.
+    path = YOLO("yolov8n.pt").export(format="onnx", imgsz=YOLO_IMGSZ, dynamic=True, opset=OPSET)
+    shutil.move(path, _target("yolo"))
+
+def export_syncnet():
+    from detectors.lipsync_detector import S, SYNCNET_MODEL_PATH
+
+    class Branch(torch.nn.Module):
+        def __init__(self, net, branch):
+            super().__init__()
+            self.net = net
+            self.branch = branch
+
+        def forward(self, x):
+            return getattr(self.net, self.branch)(x)
+
+    net = S()
+    state = torch.load(SYNCNET_MODEL_PATH, map_location="cpu")
+    # Checkpoints salvos a partir do SyncNetInstance trazem o prefixo "__S__.".
+    state = {k[len("__S__."):] if k.startswith("__S__.") else k: v for k, v in state.items()}
+    # strict: um checkpoint que não bate com a arquitetura falha aqui, em vez de
+    # exportar pesos aleatórios.
+    net.load_state_dict({k: v for k, v in state.items() if k in net.state_dict()}, strict=True)
+    net.eval()
+    batch = {0: "batch"}
+    torch.onnx.export(Branch(net, "forward_lip"), torch.zeros(1, 3, 5, 224, 224), _target("syncnet_lip"),
+                      input_names=["frames"], output_names=["embedding"],
+                      dynamic_axes={"frames": batch, "embedding": batch}, opset_version=OPSET)
+    torch.onnx.export(Branch(net, "forward_aud"), torch.zeros(1, 1, 13, 20), _target("syncnet_aud"),
+                      input_names=["mfcc"], output_names=["embedding"],
+                      dynamic_axes={"mfcc": batch, "embedding": batch}, opset_version=OPSET)
+
+def export_wav2vec2():
+    from transformers import Wav2Vec2ForCTC
+    from detectors.inteligibilidade_detector import MODEL_NAME, EXPECTED_SAMPLING_RATE
+    model = Wav2Vec2ForCTC.from_pretrained(MODEL_NAME)
+    model.config.return_dict = False
+    model.eval()
+    dummy = torch.from_numpy(np.zeros((1, EXPECTED_SAMPLING_RATE), dtype=np.float32))
+    torch.onnx.export(model, dummy, _target("wav2vec2"),
+                      input_names=["input_values"], output_names=["logits"],
+                      dynamic_axes={"input_values": {0: "batch", 1: "samples"},
+                                    "logits": {0: "batch", 1: "frames"}},
+                      opset_version=OPSET)
+
+EXPORTERS = {
+    "mobilenet": export_mobilenet,
+    "yolo": export_yolo,
+    "syncnet": export_syncnet,
+    "wav2vec2": export_wav2vec2,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(EXPORTERS)
+    for name in names:
+        if name not in EXPORTERS:
+            sys.exit(f"Modelo desconhecido: {name}. Opções: {', '.join(EXPORTERS)}")
+        logger.info(f"Exportando {name} para {ONNX_MODEL_DIR}...")
+        EXPORTERS[name]()
+    logger.info("Exportação concluída.")
@@ -1,14 +1,25 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import JSONResponse
 import shutil
 import os
 import uuid
 import logging
 import torch
 import asyncio
+import threading
 from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
+from urllib.parse import parse_qs
+from pydantic import BaseModel
 from core.engine import AnalysisEngine
+from core.media_loader import MediaLoader
+from core.ocr_service import OcrService
+from core.ingest import StreamingUpload, MEMORY_INGEST_MAX_BYTES
+from core.jobs import JobManager, QueueFull
+from core.cancellation import AnalysisCancelled
+from core.models import MODEL_WARMUP, warmup_models, models_ready, models_status, models_stats
 from detectors.detectors_v2 import (
+    EASYOCR_MODEL,
     FreezeDetectorV2,
     SignalCutDetectorV2,
     LogoDetectorV2,
@@ -32,8 +43,11 @@ from detectors.detectors_v2 import (
 
 try:
     from detectors.lipsync_detector import analyze_lipsync
+    from detectors.face_tracker import SYNCNET_FACE_TRACK, FACE_TRACK_STATUS
 except ImportError:
     analyze_lipsync = None
+    SYNCNET_FACE_TRACK = False
+    FACE_TRACK_STATUS = {"active": False, "reason": "lipsync indisponível"}
 
 try:
     from detectors.inteligibilidade_detector import (
@@ -52,16 +66,24 @@ app = FastAPI(title="Serviço de Detecção IA Otimizado (Totalmente Paralelo)")
 TEMP_DIR = os.getenv("TEMP_DIR", "temp_videos_ia")
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Volume compartilhado com o backend: clipes são lidos no lugar, sem re-upload.
+SHARED_MEDIA_DIR = os.path.realpath(os.getenv("SHARED_MEDIA_DIR", "/shared/clips"))
+
 executor = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4))
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 logger.info(f"Ambiente de Inferência detectado: {DEVICE}")
 
-def run_legacy_task(func, video_path, task_name):
+# Intervalo (s) entre verificações de desconexão do cliente nos endpoints síncronos.
+DISCONNECT_POLL_S = float(os.getenv("DISCONNECT_POLL_S", 1.0))
+
+def run_legacy_task(func, video_path, task_name, media_loader=None):
     """Função wrapper para rodar detectores standalone (Lipsync/Inteligibilidade)."""
+    if media_loader is not None and media_loader.cancelled:
+        return None
     try:
         logger.info(f"[Task] Iniciando {task_name}...")
-        result = func(video_path)
+        result = func(video_path, media_loader=media_loader)
         logger.info(f"[Task] {task_name} finalizado.")
         return result
     except Exception as e:
@@ -75,28 +97,37 @@ def run_engine_task(engine):
         results = engine.run()
         logger.info(f"[Engine] Finalizado. Encontrou {len(results)} ocorrências.")
         return results
+    except AnalysisCancelled:
+        logger.info("[Engine] Interrompido: análise cancelada.")
+        raise
     except Exception as e:
         logger.error(f"Erro fatal no Engine: {e}")
         return []
 
-@app.post("/analyze_video")
-async def analyze_video(video_file: UploadFile = File(...)):
+async def run_analysis(source, cancel_token=None):
     """
-    Endpoint principal. Executa TUDO simultaneamente usando paralelismo.
+    Executa TUDO simultaneamente usando paralelismo sobre um único contexto de mídia.
+    `source` é um caminho em disco ou um StreamingUpload (entrada em memória).
+    Com `cancel_token` cancelado, as tarefas param no próximo ponto de checagem e
+    a função levanta AnalysisCancelled.
     """
-    file_id = str(uuid.uuid4())
-    temp_video_path = os.path.join(TEMP_DIR, f"{file_id}_{video_file.filename}")
-    
     all_errors = []
+    media = None
 
     try:
-        logger.info(f"Recebendo arquivo: {video_file.filename}")
-        with open(temp_video_path, "wb") as buffer:
-            shutil.copyfileobj(video_file.file, buffer)
-        
         loop = asyncio.get_running_loop()
         tasks = []
-        engine = AnalysisEngine(temp_video_path)
+
+        # Contexto de mídia único: o arquivo é decodificado uma vez e compartilhado pelas tarefas.
+        media = await loop.run_in_executor(executor, MediaLoader, source)
+        media.cancel_token = cancel_token
+        if cancel_token is not None:
+            cancel_token.check()
+        if analyze_lipsync:
+            media.request_sync_frames(face_track=SYNCNET_FACE_TRACK)
+
+        engine = AnalysisEngine(source, media_loader=media, ocr_service=OcrService(EASYOCR_MODEL),
+                                cancel_token=cancel_token)
         engine.add_video_detector(FreezeDetectorV2())
         engine.add_video_detector(SignalCutDetectorV2())
         engine.add_video_detector(LogoDetectorV2())
@@ -127,45 +158,315 @@ async def analyze_video(video_file: UploadFile = File(...)):
         if analyze_lipsync:
             tasks.append(
                 loop.run_in_executor(
-                    executor, run_legacy_task, analyze_lipsync, temp_video_path, "Lipsync"
+                    executor, run_legacy_task, analyze_lipsync, source, "Lipsync", media
                 )
             )
 
         if analyze_inteligibilidade_st:
             tasks.append(
                 loop.run_in_executor(
-                    executor, run_legacy_task, analyze_inteligibilidade_st, temp_video_path, "Inteligibilidade ST"
+                    executor, run_legacy_task, analyze_inteligibilidade_st, source, "Inteligibilidade ST", media
                 )
             )
 
         if analyze_inteligibilidade_sap_ad:
             tasks.append(
                 loop.run_in_executor(
-                    executor, run_legacy_task, analyze_inteligibilidade_sap_ad, temp_video_path, "Inteligibilidade SAP"
+                    executor, run_legacy_task, analyze_inteligibilidade_sap_ad, source, "Inteligibilidade SAP", media
                 )
             )
 
         logger.info(f"Disparando {len(tasks)} tarefas em paralelo...")
 
-        results_list = await asyncio.gather(*tasks)
+        # Espera todas as tarefas (mesmo se uma for cancelada) antes de fechar a mídia.
+        results_list = await asyncio.gather(*tasks, return_exceptions=True)
+        if cancel_token is not None:
+            cancel_token.check()
         
         for i, res in enumerate(results_list):
+            if isinstance(res, BaseException):
+                raise res
             if isinstance(res, list): 
                 all_errors.extend(res)
             elif res: 
                 all_errors.append(res)
 
         logger.info(f"Análise completa finalizada. Total de erros: {len(all_errors)}")
+        return all_errors
+
+    finally:
+        if media is not None:
+            await asyncio.get_running_loop().run_in_executor(executor, media.close)
+
+job_manager = JobManager(run_analysis)
+
+@app.on_event("startup")
+async def start_job_manager():
+    job_manager.start()
+
+@app.on_event("startup")
+async def start_model_warmup():
+    # Os modelos carregam sob demanda; o warm-up só antecipa a carga sem bloquear o startup.
+    if MODEL_WARMUP:
+        threading.Thread(target=warmup_models, name="model-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+async def stop_job_manager():
+    await job_manager.stop()
+
+@app.get("/")
+async def health():
+    """Liveness: o processo está de pé e aceitando requisições."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: estado de cada modelo. 503 enquanto algum ainda estiver carregando."""
+    ready = models_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": models_status(), "face_track": FACE_TRACK_STATUS}
+    )
+
+@app.get("/models")
+async def models():
+    """Residência dos modelos: orçamento, memória em uso e hits/misses/cargas/tempo de carga."""
+    return {**models_stats(), "face_track": FACE_TRACK_STATUS}
+
+def queue_full(e: QueueFull):
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def admit(priority: str):
+    """
+    Valida a prioridade e recusa (429) se a fila estiver cheia. Em /analyze_stream
+    e /analyze_path roda antes de o corpo ser lido; nas rotas multipart o Starlette
+    já leu e gravou o upload quando o handler roda, então lá a checagem que evita
+    a leitura é a do middleware RejectWhenBusy, e esta só confirma a vaga.
+    """
+    try:
+        job_manager.check_capacity(priority)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except QueueFull as e:
+        raise queue_full(e)
+
+# Rotas multipart: o corpo é lido inteiro antes do handler (e das dependências).
+MULTIPART_UPLOAD_ROUTES = {"/analyze_video", "/jobs"}
+
+class RejectWhenBusy:
+    """
+    Recusa uploads multipart com a fila cheia antes de o Starlette ler o corpo.
+    Middleware ASGI puro: `receive` passa intacto, e o handler continua vendo a
+    desconexão do cliente (request.is_disconnected), que cancela jobs abandonados.
+    Um @app.middleware("http") (BaseHTTPMiddleware) esconderia essa desconexão.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] == "http" and scope["method"] == "POST"
+                and scope["path"] in MULTIPART_UPLOAD_ROUTES):
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            response = None
+            try:
+                job_manager.check_capacity(query.get("priority", ["live"])[0])
+            except ValueError as e:
+                response = JSONResponse(status_code=422, content={"detail": str(e)})
+            except QueueFull as e:
+                response = JSONResponse(status_code=429, content={"detail": str(e)},
+                                        headers={"Retry-After": str(e.retry_after)})
+            if response is not None:
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(RejectWhenBusy)
+
+def remove_temp_file(path):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+            logger.info(f"Arquivo removido: {path}")
+        except Exception as e:
+            logger.warning(f"Erro ao remover arquivo temporário: {e}")
+
+async def ingest_upload(video_file: UploadFile, priority: str):
+    """
+    Clipes da fila "live" até MEMORY_INGEST_MAX_MB ficam em memória; o resto
+    (inclusive toda a fila "archive") vai para TEMP_DIR.
+    Retorna (source, caminho temporário ou None).
+    """
+    size = getattr(video_file, "size", None)
+    if priority == "live" and size is not None and size <= MEMORY_INGEST_MAX_BYTES:
+        return StreamingUpload.from_bytes(video_file.filename, await video_file.read()), None
+
+    file_id = str(uuid.uuid4())
+    temp_video_path = os.path.join(TEMP_DIR, f"{file_id}_{video_file.filename}")
+    with open(temp_video_path, "wb") as buffer:
+        shutil.copyfileobj(video_file.file, buffer)
+    return temp_video_path, temp_video_path
+
+async def wait_for_job(job, request: Request, body_consumed=lambda: True):
+    """
+    Aguarda o job de um endpoint síncrono. Se o cliente desconectar (ex.: timeout
+    do backend) ou a requisição for abortada, o job é cancelado em vez de rodar
+    até o fim para um resultado que ninguém vai ler.
+    `body_consumed`: só consulta a desconexão depois de todo o corpo ter sido lido.
+    """
+    waiter = asyncio.ensure_future(job.wait())
+    try:
+        while True:
+            done, _ = await asyncio.wait({waiter}, timeout=DISCONNECT_POLL_S)
+            if done:
+                return waiter.result()
+            if body_consumed() and await request.is_disconnected():
+                job_manager.cancel(job.id, "cliente desconectou")
+    except asyncio.CancelledError:
+        job_manager.cancel(job.id, "requisição abortada")
+        raise
+
+def analysis_cancelled(e: AnalysisCancelled):
+    # 499 (Client Closed Request): em geral o cliente já não está mais esperando.
+    return HTTPException(status_code=499, detail=f"Análise cancelada: {e}")
+
+def submit_upload(source, temp_video_path, priority):
+    """Enfileira o job; o arquivo temporário é removido pelo worker ao final da análise."""
+    cleanup = (lambda: remove_temp_file(temp_video_path)) if temp_video_path else None
+    try:
+        return job_manager.submit(source, cleanup=cleanup, lane=priority)
+    except QueueFull as e:
+        remove_temp_file(temp_video_path)
+        raise queue_full(e)
+
+@app.post("/analyze_video")
+async def analyze_video(request: Request, video_file: UploadFile = File(...), priority: str = "live"):
+    """
+    Endpoint principal (multipart), síncrono: passa pela fila de jobs e responde
+    quando a análise termina. Com a fila cheia, responde 429 com Retry-After.
+    """
+    admit(priority)
+
+    try:
+        logger.info(f"Recebendo arquivo: {video_file.filename}")
+        source, temp_video_path = await ingest_upload(video_file, priority)
+        job = submit_upload(source, temp_video_path, priority)
+        all_errors = await wait_for_job(job, request)
         return {"errors": all_errors}
 
+    except AnalysisCancelled as e:
+        raise analysis_cancelled(e)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro crítico no processamento: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        if os.path.exists(temp_video_path):
-            try:
-                os.remove(temp_video_path)
-                logger.info(f"Arquivo removido: {temp_video_path}")
-            except Exception as e:
-                logger.warning(f"Erro ao remover arquivo temporário: {e}")
\ No newline at end of file
+
+@app.post("/analyze_stream")
+async def analyze_stream(request: Request, filename: str = "stream.mp4", priority: str = "live"):
+    """
+    Recebe o vídeo como corpo bruto da requisição (não multipart) e começa a
+    decodificar enquanto o upload ainda está chegando. Até STREAM_INGEST_MAX_MB o
+    conteúdo fica em memória; acima disso continua em um arquivo em TEMP_DIR.
+    A decodificação só avança junto com o upload se o MP4 tiver o moov no início
+    (faststart); com o moov no fim, o PyAV espera o upload completo.
+    """
+    admit(priority)
+
+    logger.info(f"Recebendo stream: {filename}")
+    upload = StreamingUpload(filename, spill_dir=TEMP_DIR)
+    try:
+        job = job_manager.submit(upload, cleanup=upload.close, lane=priority)
+    except QueueFull as e:
+        raise queue_full(e)
+
+    async def receive():
+        try:
+            async for chunk in request.stream():
+                upload.feed(chunk)
+            upload.finish()
+        except Exception as e:
+            upload.finish(error=e)
+            # Upload incompleto (cliente desconectou): não há o que analisar.
+            job_manager.cancel(job.id, "upload interrompido")
+            raise
+
+    try:
+        _, all_errors = await asyncio.gather(
+            receive(), wait_for_job(job, request, body_consumed=lambda: upload.done)
+        )
+        return {"errors": all_errors}
+
+    except AnalysisCancelled as e:
+        raise analysis_cancelled(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro crítico no processamento: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class PathAnalysisRequest(BaseModel):
+    path: str
+    priority: str = "live"
+
+@app.post("/analyze_path")
+async def analyze_path(request: Request, body: PathAnalysisRequest):
+    """
+    Analisa um clipe que já está no volume compartilhado (SHARED_MEDIA_DIR),
+    lendo o arquivo no lugar. O arquivo pertence ao backend e não é removido.
+    """
+    path = os.path.realpath(body.path)
+    if os.path.commonpath([path, SHARED_MEDIA_DIR]) != SHARED_MEDIA_DIR:
+        raise HTTPException(status_code=403, detail="Caminho fora do volume compartilhado.")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado no volume compartilhado.")
+    admit(body.priority)
+
+    try:
+        logger.info(f"Analisando arquivo compartilhado: {path}")
+        job = job_manager.submit(path, lane=body.priority)
+        all_errors = await wait_for_job(job, request)
+        return {"errors": all_errors}
+
+    except QueueFull as e:
+        raise queue_full(e)
+    except AnalysisCancelled as e:
+        raise analysis_cancelled(e)
+    except Exception as e:
+        logger.error(f"Erro crítico no processamento: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/jobs", status_code=202)
+async def create_job(video_file: UploadFile = File(...), priority: str = "live"):
+    """
+    Versão assíncrona de /analyze_video: enfileira a análise e retorna o id do job
+    imediatamente. O resultado é consultado em GET /jobs/{id}.
+    `priority`: "live" (clipes do monitoramento) ou "archive" (modo FILE).
+    """
+    admit(priority)
+
+    logger.info(f"Recebendo arquivo (job): {video_file.filename}")
+    source, temp_video_path = await ingest_upload(video_file, priority)
+    job = submit_upload(source, temp_video_path, priority)
+    return {"id": job.id, "status": job.status}
+
+@app.get("/jobs")
+async def jobs_stats():
+    return job_manager.stats()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancela um job na fila ou em execução; o status final aparece em GET /jobs/{id}."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    if job.finished:
+        raise HTTPException(status_code=409, detail=f"Job já finalizado ({job.status}).")
+    job_manager.cancel(job_id, "cancelado via API")
+    return job.to_dict()